@@ -2,17 +2,31 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import os
 import json
+import time
+import functools
+from collections import Counter
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+import babel.dates
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context
 from flask_moment import Moment
+from jinja2 import FileSystemBytecodeCache
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import logging
-from logging import Formatter, FileHandler
+import click
 from flask_wtf import Form
 from forms import *
+from search import search_backend
+from cache import ResponseCache, cache_backend
+from importer import ImportSpec, run_import
+from exporter import MIMETYPES, export_lines, parse_since, next_since
+from fsnd_common.pool import register_metrics
+from fsnd_common.compression import register_compression
+from profiler import QueryProfiler, log_handler
+from assets import Assets, Build
+from fsnd_common.versions import TableVersions
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -22,8 +36,23 @@ moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
 
+# Template loading, see the production profile in config.py
+app.jinja_env.auto_reload = app.config['TEMPLATES_AUTO_RELOAD']
+if app.config['TEMPLATE_CACHE_DIR']:
+  os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+  app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
 # TODO: connect to a local postgresql database
 migrate = Migrate(app, db)
+cache = ResponseCache(cache_backend(app.config))
+register_metrics(app, db)
+register_compression(app)
+assets = Assets(app, app.config['ASSETS_MANIFEST'])
+# Table version counters behind the ETags of the read pages, see fsnd_common/versions.py
+versions = TableVersions(db)
+
+SHOWS_PER_PAGE = 30
+SEARCH_RESULTS_PER_PAGE = 20
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
@@ -44,12 +73,25 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(db.ARRAY(db.String).with_variant(db.JSON, 'sqlite'))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String)
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # Denormalized show counters kept up to date by count_shows() and
+    # refresh_show_counts(), so listings don't have to aggregate shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Drives the incremental exports, see exporter.py
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Indexes backing the name search and the /search filters, see search.py
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Venue_state_city', 'state', 'city'),
+    )
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
@@ -61,88 +103,309 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(db.ARRAY(db.String).with_variant(db.JSON, 'sqlite'))
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String)
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
+    # Denormalized show counters kept up to date by count_shows() and
+    # refresh_show_counts(), so listings don't have to aggregate shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Drives the incremental exports, see exporter.py
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Indexes backing the name search and the /search filters, see search.py
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Artist_state_city', 'state', 'city'),
+    )
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Show(db.Model):
   __tablename__ = 'Show'
   id = db.Column(db.Integer, primary_key=True)
-  start_time = db.Column(db.DateTime())
+  start_time = db.Column(db.DateTime(), nullable=False)
 
-  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
-  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), index=True)
+  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), index=True)
+  # Drives the incremental exports, see exporter.py
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
   artist = db.relationship(Artist, backref=db.backref('shows', cascade='all, delete'))
   venue = db.relationship(Venue, backref=db.backref('shows', cascade='all, delete'))
+
+  # Backs the keyset pagination of /shows
+  __table_args__ = (db.Index('ix_Show_start_time_id', 'start_time', 'id'),)
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # Compiled babel pattern and locale, built once per (format, locale)
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # Views pass datetimes straight through, strings are still parsed
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  if value.tzinfo is None:
+    # Same as babel.dates.format_datetime: naive values are taken as UTC
+    value = value.replace(tzinfo=babel.dates.UTC)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+def period_shows_query(relationship, criterion, *columns):
+  # Shows joined with the other side of the booking in a single query. The
+  # past/upcoming split and both counts (a window aggregate per period) are
+  # computed by the database, so the page cost doesn't grow with show history
+  upcoming = Show.start_time > datetime.now()
+  return db.session.query(
+    Show.start_time,
+    upcoming.label('upcoming'),
+    db.func.count(Show.id).over(partition_by=upcoming).label('period_count'),
+    *columns
+  ).join(relationship) \
+    .filter(criterion) \
+    .order_by(Show.start_time)
+
+def split_by_period(rows, columns):
+  data = {
+    "past_shows": [],
+    "upcoming_shows": [],
+    "past_shows_count": 0,
+    "upcoming_shows_count": 0,
+  }
+  for row in rows:
+    period = 'upcoming' if row.upcoming else 'past'
+    show = {column.key: getattr(row, column.key) for column in columns}
+    show['start_time'] = row.start_time
+    data[period + '_shows'].append(show)
+    data[period + '_shows_count'] = row.period_count
+  return data
+
+VENUE_SHOW_COLUMNS = (
+  Artist.id.label('artist_id'),
+  Artist.name.label('artist_name'),
+  Artist.image_link.label('artist_image_link')
+)
+ARTIST_SHOW_COLUMNS = (
+  Venue.id.label('venue_id'),
+  Venue.name.label('venue_name'),
+  Venue.image_link.label('venue_image_link')
+)
+
+def venue_shows_query(venue_id):
+  return period_shows_query(Show.artist, Show.venue_id == venue_id, *VENUE_SHOW_COLUMNS)
+
+def artist_shows_query(artist_id):
+  return period_shows_query(Show.venue, Show.artist_id == artist_id, *ARTIST_SHOW_COLUMNS)
+
+def count_shows(shows, delta):
+  # Adds delta to the show counters of the venues and artists of the shows,
+  # in the current transaction
+  now = datetime.now()
+  changes = Counter()
+  for show in shows:
+    counter = 'upcoming_shows_count' if show.start_time > now else 'past_shows_count'
+    changes[Venue, show.venue_id, counter] += delta
+    changes[Artist, show.artist_id, counter] += delta
+  for (model, id, counter), change in changes.items():
+    column = getattr(model, counter)
+    model.query.filter(model.id == id).update({column: column + change}, synchronize_session=False)
+
+def actual_show_counts(model, foreign_key):
+  # Correlated subqueries counting the upcoming and past shows of each row
+  now = datetime.now()
+  shows = db.select([db.func.count(Show.id)]).where(foreign_key == model.id)
+  return shows.where(Show.start_time > now).as_scalar(), shows.where(Show.start_time <= now).as_scalar()
+
+SHOW_COUNTERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+def show_count_drift():
+  # Rows whose counters disagree with their shows, as (model, id, stored, actual)
+  drift = []
+  for model, foreign_key in SHOW_COUNTERS:
+    upcoming, past = actual_show_counts(model, foreign_key)
+    rows = db.session.query(model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past) \
+      .filter(db.or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past))
+    for id, stored_upcoming, stored_past, actual_upcoming, actual_past in rows:
+      drift.append((model.__name__, id, (stored_upcoming, stored_past), (actual_upcoming, actual_past)))
+  return drift
+
+def refresh_show_counts():
+  # Recomputes the counters of the rows that drifted, including shows that
+  # became past ones since the last refresh. Returns the number of rows fixed
+  fixed = 0
+  for model, foreign_key in SHOW_COUNTERS:
+    upcoming, past = actual_show_counts(model, foreign_key)
+    table = model.__table__
+    result = db.session.execute(table.update()
+      .where(db.or_(table.c.upcoming_shows_count != upcoming, table.c.past_shows_count != past))
+      .values(upcoming_shows_count=upcoming, past_shows_count=past))
+    fixed += result.rowcount
+  db.session.commit()
+  return fixed
+
+def started_shows(criterion):
+  # Shows already started, the detail pages split them into past and upcoming
+  # ones so these pages change with time too
+  return [db.select([db.func.count(Show.id)]).where(criterion).where(Show.start_time <= datetime.now()).as_scalar()]
+
+def venue_pages(venue_id):
+  # Cached pages showing a venue: its own, the listings and its artists' pages
+  artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return ['venues', 'shows', 'venue:{0}'.format(venue_id)] + ['artist:{0}'.format(row.artist_id) for row in artist_ids]
+
+def artist_pages(artist_id):
+  # Cached pages showing an artist: its own, the listings and its venues' pages
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return ['artists', 'shows', 'artist:{0}'.format(artist_id)] + ['venue:{0}'.format(row.venue_id) for row in venue_ids]
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
+@versions.conditional()
+@cache.cached('index')
 def index():
   return render_template('pages/home.html')
 
 
+#  Search
+#  ----------------------------------------------------------------
+
+def stream_template(template_name, **context):
+  # Renders the template piece by piece while the response is being sent
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  return Response(stream_with_context(template.generate(context)))
+
+def search_page(query, pager):
+  # Streams the rows of a page, remembering whether an extra row showed up
+  for index, row in enumerate(query.yield_per(SEARCH_RESULTS_PER_PAGE)):
+    if index == SEARCH_RESULTS_PER_PAGE:
+      pager['next'] = True
+      break
+    yield row
+
+@app.route('/search')
+@versions.conditional(Venue, Artist)
+def search():
+  # Venues and artists at once, filtered by name, area and genres
+  page, filters, query = search_query(request.args)
+  pager = {'page': page, 'next': False}
+  return stream_template(
+    'pages/search.html',
+    results=search_page(query, pager),
+    pager=pager,
+    filters=filters,
+    genres=SEARCH_GENRES
+  )
+
+SEARCH_GENRES = [choice for choice, label in VenueForm.genres.kwargs['choices']]
+
+def search_query(args):
+  # The requested page, the filters read from the query string and the query
+  # fetching that page (one row more than shown)
+  page = max(args.get('page', 1, int), 1)
+  filters = {
+    'term': args.get('search_term', '').strip(),
+    'city': args.get('city', '').strip(),
+    'state': args.get('state', '').strip(),
+    'genres': args.getlist('genres'),
+  }
+  query = search_backend(db.session).search_all(
+    {'venue': Venue, 'artist': Artist},
+    page=page,
+    per_page=SEARCH_RESULTS_PER_PAGE,
+    **filters
+  )
+  return page, filters, query
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  areas = db.session.query(Venue.city, Venue.state).distinct(Venue.city, Venue.state).order_by(Venue.state).all()
+def venue_areas_query():
+  # Every venue with its materialized upcoming show count, ordered so venues
+  # of the same area come out next to each other
+  return db.session.query(
+    Venue.id,
+    Venue.name,
+    Venue.city,
+    Venue.state,
+    Venue.upcoming_shows_count.label('num_upcoming_shows')
+  ).order_by(Venue.state, Venue.city, Venue.name)
+
+def group_venue_areas(rows):
+  # Grouping by (city, state) in a single pass over the sorted rows
   data = []
-  for area in areas:
-    venues = Venue.query.filter_by(state=area.state).filter_by(city=area.city).order_by(Venue.name).all()
-    data.append({
-      'city': area.city,
-      'state': area.state,
-      'venues': venues
+  for row in rows:
+    if not data or data[-1]['city'] != row.city or data[-1]['state'] != row.state:
+      data.append({
+        'city': row.city,
+        'state': row.state,
+        'venues': []
       })
-  return render_template('pages/venues.html', areas=data);
+    data[-1]['venues'].append({
+      'id': row.id,
+      'name': row.name,
+      'num_upcoming_shows': row.num_upcoming_shows
+    })
+  return data
+
+def venue_areas():
+  return group_venue_areas(venue_areas_query().all())
+
+@app.route('/venues')
+@versions.conditional(Venue)
+@cache.cached('venues')
+def venues():
+  return render_template('pages/venues.html', areas=venue_areas())
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  term = '%{0}%'.format(request.form.get('search_term'))
-  result = Venue.query.filter(Venue.name.ilike(term)).all()
+  result, count = search_backend(db.session).search_counted(Venue.name, request.form.get('search_term', ''))
   response = {
-    "count": len(result),
+    "count": count,
     "data": result
   }
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@versions.conditional(Venue, Artist, Show, extra=lambda venue_id: started_shows(Show.venue_id == venue_id))
+@cache.cached('venue', 'venue_id')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  venue = Venue.query.get(venue_id)
-  shows = Show.query.filter(Show.venue_id==venue_id).all()
-  data = {
+  venue = Venue.query.get_or_404(venue_id)
+  data = venue_details(venue)
+  data.update(split_by_period(venue_shows_query(venue_id).all(), VENUE_SHOW_COLUMNS))
+  return render_template('pages/show_venue.html', venue=data)
+
+def venue_details(venue):
+  return {
     "id": venue.id,
     "name": venue.name,
     "genres": venue.genres,
@@ -155,31 +418,7 @@ def show_venue(venue_id):
     "seeking_talent": venue.seeking_talent,
     "seeking_description": venue.seeking_description,
     "image_link": venue.image_link,
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
   }
-  for show in shows:
-    artist = Artist.query.get(show.artist_id)
-    if show.start_time > datetime.now():
-      data['upcoming_shows'].append({
-        "artist_id": artist.id,
-        "artist_name": artist.name,
-        "artist_image_link": artist.image_link,
-        "start_time": str(show.start_time)
-      })
-    else:
-      data['past_shows'].append({
-        "artist_id": artist.id,
-        "artist_name": artist.name,
-        "artist_image_link": artist.image_link,
-        "start_time": str(show.start_time)
-      })
-  data['past_shows_count'] = len(data['past_shows'])
-  data['upcoming_shows_count'] = len(data['upcoming_shows'])
-
-  return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -218,6 +457,7 @@ def create_venue_submission():
   finally:
     if not error:
       db.session.commit()
+      cache.invalidate('venues')
       flash('Venue {0} was successfully listed!'.format(form.name.data))
     else:
       flash('An error occurred. Venue {0} could not be listed.'.format(form.name.data))
@@ -230,9 +470,15 @@ def create_venue_submission():
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+  pages = venue_pages(venue_id)
   try:
-    Venue.query.filter_by(id=venue_id).delete()
+    venue = Venue.query.get(venue_id)
+    if venue:
+      # Its shows are deleted along with the venue
+      count_shows(venue.shows, -1)
+      db.session.delete(venue)
     db.session.commit()
+    cache.invalidate(*pages)
   except:
     db.session.rollback()
   finally:
@@ -247,31 +493,40 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@versions.conditional(Artist)
+@cache.cached('artists')
 def artists():
   # TODO: replace with real data returned from querying the database
-  data = Artist.query.order_by(Artist.state).all()
+  data = artists_query().all()
   return render_template('pages/artists.html', artists=data)
 
+def artists_query():
+  return Artist.query.order_by(Artist.state)
+
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  term = '%{0}%'.format(request.form.get('search_term'))
-  result = Artist.query.filter(Artist.name.ilike(term)).all()
+  result, count = search_backend(db.session).search_counted(Artist.name, request.form.get('search_term', ''))
   response = {
-    "count": len(result),
+    "count": count,
     "data": result
   }
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
+@versions.conditional(Artist, Venue, Show, extra=lambda artist_id: started_shows(Show.artist_id == artist_id))
+@cache.cached('artist', 'artist_id')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  artist = Artist.query.get(artist_id)
-  shows = Show.query.filter(Show.artist_id==artist_id).all()
-  data = {
+  # shows the artist page with the given artist_id
+  artist = Artist.query.get_or_404(artist_id)
+  data = artist_details(artist)
+  data.update(split_by_period(artist_shows_query(artist_id).all(), ARTIST_SHOW_COLUMNS))
+  return render_template('pages/show_artist.html', artist=data)
+
+def artist_details(artist):
+  return {
     "id": artist.id,
     "name": artist.name,
     "genres": artist.genres,
@@ -283,31 +538,7 @@ def show_artist(artist_id):
     "seeking_venue": artist.seeking_venue,
     "seeking_description": artist.seeking_description,
     "image_link": artist.image_link,
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0
   }
-  for show in shows:
-    venue = Venue.query.get(show.venue_id)
-    if show.start_time > datetime.now():
-      data['upcoming_shows'].append({
-        "venue_id": venue.id,
-        "venue_name": venue.name,
-        "venue_image_link": venue.image_link,
-        "start_time": str(show.start_time)
-      })
-    else:
-      data['upcoming_shows'].append({
-        "venue_id": venue.id,
-        "venue_name": venue.name,
-        "venue_image_link": venue.image_link,
-        "start_time": str(show.start_time)
-      })
-  data['past_shows_count'] = len(data['past_shows'])
-  data['upcoming_shows_count'] = len(data['upcoming_shows'])
-  
-  return render_template('pages/show_artist.html', artist=data)
 
 #  Update
 #  ----------------------------------------------------------------
@@ -349,6 +580,7 @@ def edit_artist_submission(artist_id):
   artist.seeking_description = form.seeking_description.data
   try:
     db.session.commit()
+    cache.invalidate(*artist_pages(artist_id))
     flash('Artist {0} was successfully modified!'.format(form.name.data))
   except:
     db.session.rollback()
@@ -399,6 +631,7 @@ def edit_venue_submission(venue_id):
   venue.seeking_description = form.seeking_description.data
   try:
     db.session.commit()
+    cache.invalidate(*venue_pages(venue_id))
     flash('Venue {0} was successfully modified!'.format(form.name.data))
   except:
     db.session.rollback()
@@ -441,6 +674,7 @@ def create_artist_submission():
   finally:
     if not error:
       db.session.commit()
+      cache.invalidate('artists')
       flash('Artist {0} was successfully listed!'.format(form.name.data))
     else:
       flash('An error occurred. Artist {0} could not be listed.'.format(form.name.data))
@@ -459,25 +693,54 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
+def show_cursor(row):
+  return '{0}_{1}'.format(row.start_time.isoformat(), row.id)
+
+def parse_show_cursor(cursor):
+  try:
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+  except ValueError:
+    abort(400)
+
 @app.route('/shows')
+@versions.conditional(Show, Venue, Artist)
+@cache.cached('shows')
 def shows():
   # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  shows = Show.query.all()
+  data, next_cursor = shows_page(shows_query(request.args.get('after')).all())
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
+
+def shows_query(after=None):
+  # Keyset pagination on (start_time, id): the page is located through the
+  # composite index, so any page costs the same as the first one
+  query = db.session.query(
+    Show.id,
+    Show.start_time,
+    Venue.id.label('venue_id'),
+    Venue.name.label('venue_name'),
+    Artist.id.label('artist_id'),
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link')
+  ).join(Show.venue).join(Show.artist)
+  if after:
+    query = query.filter(db.tuple_(Show.start_time, Show.id) > parse_show_cursor(after))
+  return query.order_by(Show.start_time, Show.id).limit(SHOWS_PER_PAGE + 1)
+
+def shows_page(rows):
+  # The page's shows and the cursor of the next page, if any
+  next_cursor = show_cursor(rows[SHOWS_PER_PAGE - 1]) if len(rows) > SHOWS_PER_PAGE else None
   data = []
-  for show in shows:
-    venue = Venue.query.get(show.venue_id)
-    artist = Artist.query.get(show.artist_id)
+  for row in rows[:SHOWS_PER_PAGE]:
     data.append({
-      "venue_id": venue.id,
-      "venue_name": venue.name,
-      "artist_id": artist.id,
-      "artist_name": artist.name,
-      "artist_image_link": artist.image_link,
-      "start_time": str(show.start_time)
+      "venue_id": row.venue_id,
+      "venue_name": row.venue_name,
+      "artist_id": row.artist_id,
+      "artist_name": row.artist_name,
+      "artist_image_link": row.artist_image_link,
+      "start_time": row.start_time
     })
-  return render_template('pages/shows.html', shows=data)
+  return data, next_cursor
 
 @app.route('/shows/create')
 def create_shows():
@@ -504,11 +767,13 @@ def create_show_submission():
   )
   try:
     db.session.add(newShow)
+    count_shows([newShow], 1)
   except:
     error = True
   finally:
     if not error:
       db.session.commit()
+      cache.invalidate('shows', 'venues', 'venue:{0}'.format(newShow.venue_id), 'artist:{0}'.format(newShow.artist_id))
       flash('Show was successfully listed!')
     else:
       flash('An error occurred. Show could not be listed.')
@@ -523,6 +788,174 @@ def create_show_submission():
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
+@app.route('/cache/stats')
+def cache_stats():
+  return jsonify(cache.stats())
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def existing_references(session, batch):
+  # Keeps the shows whose venue and artist exist, checked with one query per
+  # table for the whole batch
+  candidates, rejections = [], []
+  for number, row in batch:
+    if row['venue_id'].isdigit() and row['artist_id'].isdigit():
+      candidates.append((number, dict(row, venue_id=int(row['venue_id']), artist_id=int(row['artist_id']))))
+    else:
+      rejections.append((number, {'venue_id': ['Venue and artist ids must be numbers.']}))
+  venue_ids = {id for id, in session.query(Venue.id).filter(Venue.id.in_({row['venue_id'] for number, row in candidates}))}
+  artist_ids = {id for id, in session.query(Artist.id).filter(Artist.id.in_({row['artist_id'] for number, row in candidates}))}
+  rows = []
+  for number, row in candidates:
+    if row['venue_id'] in venue_ids and row['artist_id'] in artist_ids:
+      rows.append(row)
+    else:
+      rejections.append((number, {'venue_id': ['Venue or artist doesn\'t exist!']}))
+  return rows, rejections
+
+IMPORTS = {
+  'venues': ImportSpec(Venue, VenueForm, lambda form: {
+    'name': form.name.data,
+    'city': form.city.data,
+    'state': form.state.data,
+    'address': form.address.data,
+    'phone': form.phone.data,
+    'genres': form.genres.data,
+    'facebook_link': form.facebook_link.data,
+    'image_link': form.image_link.data,
+    'website': form.website_link.data,
+    'seeking_talent': form.seeking_talent.data,
+    'seeking_description': form.seeking_description.data
+  }),
+  'artists': ImportSpec(Artist, ArtistForm, lambda form: {
+    'name': form.name.data,
+    'city': form.city.data,
+    'state': form.state.data,
+    'phone': form.phone.data,
+    'genres': form.genres.data,
+    'facebook_link': form.facebook_link.data,
+    'image_link': form.image_link.data,
+    'website': form.website_link.data,
+    'seeking_venue': form.seeking_venue.data,
+    'seeking_description': form.seeking_description.data
+  }),
+  'shows': ImportSpec(Show, ShowForm, lambda form: {
+    'artist_id': form.artist_id.data.strip(),
+    'venue_id': form.venue_id.data.strip(),
+    'start_time': form.start_time.data
+  }, check=existing_references),
+}
+
+def invalidate_from_cli(*namespaces):
+  # The commands run in a process of their own, which only reaches the
+  # web workers' cached pages through a shared backend
+  if not cache.backend.shared:
+    click.echo('cached pages not invalidated: the {0} backend lives in each web worker, '
+      'they expire within CACHE_TTL ({1}s)'.format(app.config['CACHE_BACKEND'], cache.backend.ttl))
+    return
+  cache.invalidate(*namespaces)
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows written per INSERT batch.')
+@click.option('--resume/--restart', default=True, help='Continue after the last checkpointed batch.')
+def import_command(kind, path, format, batch_size, resume):
+  """Bulk imports venues, artists or shows from a CSV or NDJSON file."""
+  def reject(number, errors):
+    click.echo('record {0} rejected: {1}'.format(number, errors), err=True)
+  progress = run_import(db.session, IMPORTS[kind], path, format, batch_size, resume, reject)
+  if kind == 'shows':
+    refresh_show_counts()
+    invalidate_from_cli('shows', 'venues', 'artists', 'venue:*', 'artist:*')
+  else:
+    invalidate_from_cli(kind)
+  click.echo('{0} {1} imported, {2} rejected in {3:.1f}s ({4:.0f} rows/s)'.format(
+    progress['imported'], kind, progress['rejected'], progress['seconds'], progress['rows_per_second']))
+
+@app.cli.command('refresh-show-counts')
+def refresh_show_counts_command():
+  """Recomputes drifted show counters, meant to run periodically (cron)."""
+  fixed = refresh_show_counts()
+  invalidate_from_cli('venues', 'artists', 'venue:*', 'artist:*')
+  click.echo('{0} venues and artists updated'.format(fixed))
+
+@app.cli.command('check-show-counts')
+@click.option('--fix', is_flag=True, help='Reconcile the drifted counters.')
+def check_show_counts_command(fix):
+  """Reports venues and artists whose show counters disagree with their shows."""
+  drift = show_count_drift()
+  for model, id, stored, actual in drift:
+    click.echo('{0} {1}: stored (upcoming, past) {2}, actual {3}'.format(model, id, stored, actual))
+  click.echo('{0} drifted counters'.format(len(drift)))
+  if drift and fix:
+    click.echo('{0} venues and artists updated'.format(refresh_show_counts()))
+    invalidate_from_cli('venues', 'artists', 'venue:*', 'artist:*')
+
+@app.cli.command('precompile-templates')
+@click.option('--cache-dir', type=click.Path(file_okay=False), help='Defaults to TEMPLATE_CACHE_DIR.')
+def precompile_templates_command(cache_dir):
+  """Compiles every template into the bytecode cache, meant to run at deploy time."""
+  cache_dir = cache_dir or app.config['TEMPLATE_CACHE_DIR']
+  if not cache_dir:
+    raise click.UsageError('no TEMPLATE_CACHE_DIR outside the production profile, pass --cache-dir')
+  os.makedirs(cache_dir, exist_ok=True)
+  app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+  started = time.perf_counter()
+  names = app.jinja_env.list_templates()
+  for name in names:
+    app.jinja_env.get_template(name)
+  click.echo('{0} templates compiled into {1} in {2:.0f} ms'.format(len(names), cache_dir, (time.perf_counter() - started) * 1000))
+
+@app.cli.command('build-assets')
+def build_assets_command():
+  """Writes the bundled, fingerprinted and compressed assets to static/dist."""
+  started = time.perf_counter()
+  manifest = Build(app.static_folder).run()
+  click.echo('{0} assets written to {1} in {2:.0f} ms'.format(
+    len(manifest), os.path.join(app.static_folder, 'dist'), (time.perf_counter() - started) * 1000))
+
+EXPORTS = {
+  'venues': Venue,
+  'artists': Artist,
+  'shows': Show,
+}
+
+@app.route('/export/<kind>.<format>')
+def export(kind, format):
+  # Nightly extracts, streamed row by row. ?since= only returns rows updated
+  # after that time; X-Export-Next-Since is the value to pass on the next
+  # run, overlapping this one (see exporter.py)
+  if kind not in EXPORTS or format not in MIMETYPES:
+    abort(404)
+  try:
+    since = parse_since(request.args.get('since'))
+  except ValueError:
+    abort(400)
+  started = datetime.utcnow()
+  lines = export_lines(db.session, EXPORTS[kind], format, since)
+  response = Response(stream_with_context(lines), mimetype=MIMETYPES[format])
+  response.headers['X-Export-Next-Since'] = next_since(started)
+  return response
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', type=click.Choice(sorted(MIMETYPES)), default='ndjson', show_default=True)
+@click.option('--since', help='Only rows updated after this ISO 8601 time, UTC unless it has an offset.')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+def export_command(kind, format, since, output):
+  """Streams every venue, artist or show as NDJSON or CSV."""
+  started = datetime.utcnow()
+  try:
+    since = parse_since(since)
+  except ValueError:
+    raise click.BadParameter('not an ISO 8601 time', param_hint='--since')
+  output.writelines(export_lines(db.session, EXPORTS[kind], format, since))
+  click.echo('Next incremental export: --since {0}'.format(next_since(started)), err=True)
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -533,19 +966,19 @@ def server_error(error):
 
 
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
     app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    app.logger.addHandler(log_handler('error.log'))
     app.logger.info('errors')
 
+# Server-Timing headers and slow-request log, see profiler.py
+if app.config.get('SQL_PROFILER'):
+    QueryProfiler(app)
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
+# Development server, production runs python serve.py
 # Default port:
 if __name__ == '__main__':
     app.run()
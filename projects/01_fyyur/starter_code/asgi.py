@@ -0,0 +1,284 @@
+'''
+ASGI entry point serving the read-heavy pages from an async engine, so a
+worker keeps answering other requests while its queries wait on the
+database. Needs SQLAlchemy 1.4 and an ASGI server:
+
+    pip install "SQLAlchemy>=1.4" asyncpg uvicorn
+    uvicorn asgi:application --workers 4
+
+GET /venues, /artists, /shows, /search and the venue and artist pages run
+the queries of the Flask views on an asyncpg engine (aiosqlite for SQLite)
+and render the same templates, without the response cache. Every other
+request, writes included, is handed to the Flask app on a thread pool.
+
+Pages rendered here skip the WSGI middleware and the view decorators, so
+they carry no ETag or Last-Modified, never answer 304 (see
+fsnd_common/versions.py) and are sent uncompressed (see fsnd_common/compression.py).
+Put a compressing proxy in front of uvicorn; clients revalidating pages
+get them in full.
+'''
+import asyncio
+import io
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, render_template, request, session
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import (
+    app, Venue, Artist, VENUE_SHOW_COLUMNS, ARTIST_SHOW_COLUMNS, SEARCH_RESULTS_PER_PAGE, SEARCH_GENRES,
+    venue_areas_query, group_venue_areas, artists_query, shows_query, shows_page, search_query,
+    venue_details, venue_shows_query, artist_details, artist_shows_query, split_by_period
+)
+from fsnd_common.pool import engine_options
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+# Threads running the requests handed to the Flask app
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+# Chunks a WSGI response may run ahead of the client before its thread waits
+WSGI_BUFFERED_CHUNKS = int(os.environ.get('ASGI_WSGI_BUFFERED_CHUNKS', 16))
+
+
+def async_engine(database_uri):
+    # Same pool settings as the Flask app; asyncpg takes the statement
+    # timeout as a server setting instead of a libpq option
+    url = make_url(database_uri)
+    options = engine_options(database_uri)
+    options.pop('poolclass', None)
+    if options.pop('connect_args', None):
+        options['connect_args'] = {'server_settings': {'statement_timeout': os.environ['DB_STATEMENT_TIMEOUT']}}
+    return create_async_engine(url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]), **options)
+
+
+#----------------------------------------------------------------------------#
+# Reads.
+#----------------------------------------------------------------------------#
+
+# Each read is a generator run inside a request context. It yields the
+# queries it needs (a tuple of them to run concurrently), receives their
+# rows, and returns the template to render with its context.
+
+def venues():
+    rows = yield venue_areas_query()
+    return 'pages/venues.html', {'areas': group_venue_areas(rows)}
+
+
+def artists():
+    rows = yield artists_query()
+    return 'pages/artists.html', {'artists': rows}
+
+
+def shows():
+    rows = yield shows_query(request.args.get('after'))
+    data, next_cursor = shows_page(rows)
+    return 'pages/shows.html', {'shows': data, 'next_cursor': next_cursor}
+
+
+def search():
+    page, filters, query = search_query(request.args)
+    rows = yield query
+    return 'pages/search.html', {
+        'results': rows[:SEARCH_RESULTS_PER_PAGE],
+        'pager': {'page': page, 'next': len(rows) > SEARCH_RESULTS_PER_PAGE},
+        'filters': filters,
+        'genres': SEARCH_GENRES,
+    }
+
+
+def show_venue(venue_id):
+    venue, rows = yield Venue.query.filter(Venue.id == venue_id), venue_shows_query(venue_id)
+    if not venue:
+        abort(404)
+    data = venue_details(venue[0])
+    data.update(split_by_period(rows, VENUE_SHOW_COLUMNS))
+    return 'pages/show_venue.html', {'venue': data}
+
+
+def show_artist(artist_id):
+    artist, rows = yield Artist.query.filter(Artist.id == artist_id), artist_shows_query(artist_id)
+    if not artist:
+        abort(404)
+    data = artist_details(artist[0])
+    data.update(split_by_period(rows, ARTIST_SHOW_COLUMNS))
+    return 'pages/show_artist.html', {'artist': data}
+
+
+READS = [
+    (re.compile(r'/venues'), venues),
+    (re.compile(r'/artists'), artists),
+    (re.compile(r'/shows'), shows),
+    (re.compile(r'/search'), search),
+    (re.compile(r'/venues/(?P<venue_id>\d+)'), show_venue),
+    (re.compile(r'/artists/(?P<artist_id>\d+)'), show_artist),
+]
+
+
+#----------------------------------------------------------------------------#
+# ASGI application.
+#----------------------------------------------------------------------------#
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = environ[name] + ',' + value if name in environ else value
+    return environ
+
+
+async def read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+class AsyncReads:
+    '''
+    ASGI application answering the reads listed in READS itself and handing
+    anything else to the WSGI app. Reads that end in an HTTP error (an unknown
+    venue, a bad cursor) or whose visitor has flashed messages waiting are
+    handed over too, so those pages look exactly as the Flask app renders them.
+    '''
+
+    def __init__(self, wsgi_app, engine):
+        self.wsgi_app = wsgi_app
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=WSGI_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        environ = wsgi_environ(scope, await read_body(receive))
+        if scope['method'] == 'GET':
+            for pattern, read in READS:
+                match = pattern.fullmatch(scope['path'])
+                if match:
+                    body = await self.read(environ, read, {key: int(value) for key, value in match.groupdict().items()})
+                    if body is not None:
+                        return await self.respond(send, 200, [(b'content-type', b'text/html; charset=utf-8')], body)
+                    break
+        await self.call_wsgi(environ, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def fetch(self, query):
+        async with self.engine.connect() as connection:
+            return (await connection.execute(query)).all()
+
+    async def read(self, environ, read, arguments):
+        # Steps through the read, each step in its own request context since
+        # contexts can't stay pushed across awaits. None hands the request over
+        steps = read(**arguments)
+        rows = None
+        while True:
+            with app.request_context(environ):
+                try:
+                    if rows is None and '_flashes' in session:
+                        return None
+                    queries = steps.send(rows)
+                except StopIteration as done:
+                    template, context = done.value
+                    return render_template(template, **context).encode('utf-8')
+                except HTTPException:
+                    return None
+                concurrent = isinstance(queries, tuple)
+                statements = [query.statement for query in queries] if concurrent else [queries.statement]
+            rows = await asyncio.gather(*[self.fetch(statement) for statement in statements])
+            rows = tuple(rows) if concurrent else rows[0]
+
+    async def respond(self, send, status, headers, body):
+        headers = headers + [(b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def call_wsgi(self, environ, send):
+        # Runs the WSGI app on the thread pool, a single thread per request so
+        # streamed responses keep their request context, and forwards its chunks
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=WSGI_BUFFERED_CHUNKS)
+        abandoned = threading.Event()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        def put(chunk):
+            # Waits while the queue is full, so a slow client holds the app back
+            asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+
+        def run():
+            try:
+                iterable = self.wsgi_app(environ, start_response)
+                try:
+                    for chunk in iterable:
+                        if abandoned.is_set():
+                            break
+                        if chunk:
+                            put(chunk)
+                finally:
+                    if hasattr(iterable, 'close'):
+                        iterable.close()
+            finally:
+                put(None)
+
+        done = loop.run_in_executor(self.executor, run)
+        chunk = b''
+        try:
+            chunk = await chunks.get()
+            if 'status' not in response:
+                await done
+            await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            while chunk is not None:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await chunks.get()
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # A client gone mid-response stops the app at its next chunk; the
+            # queue is drained so the thread isn't left waiting on it
+            abandoned.set()
+            while chunk is not None:
+                chunk = await chunks.get()
+        await done
+
+application = AsyncReads(app, async_engine(app.config['SQLALCHEMY_DATABASE_URI']))
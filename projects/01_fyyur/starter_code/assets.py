@@ -0,0 +1,217 @@
+'''
+Static asset pipeline. `flask build-assets` concatenates and minifies the
+stylesheets and scripts of BUNDLES, copies the other static files, names
+every output after a hash of its content and writes them to static/dist
+along with gzip variants (brotli too when the brotli package is installed)
+and a manifest mapping the source names to the fingerprinted ones.
+
+Templates link assets with asset_url(filename), taking the same arguments
+as url_for('static', ...), and asset_urls(bundle). Once the manifest is
+loaded they point to static/dist, served with a one year immutable
+Cache-Control and the precompressed variant the browser accepts. Without
+it (the development profile) they point to the source files.
+'''
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Bundle name and its source files, in load order
+BUNDLES = {
+    'css/site.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded in <head>, before the page renders
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # Deferred, after jQuery
+    'js/site.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# Formats worth compressing, the others (images, woff) already are
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.eot', '.otf', '.ttf'}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CSS_SET_ASIDE = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/''', re.S)
+# Whitespace around colons is kept, it matters in selectors (a :hover)
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def minify_css(text):
+    # Drops comments and collapses whitespace, strings are set aside meanwhile
+    strings = []
+
+    def set_aside(match):
+        if match.group(0).startswith('/*'):
+            return ''
+        strings.append(match.group(0))
+        return '\0{0}\0'.format(len(strings) - 1)
+    text = re.sub(r'\s+', ' ', CSS_SET_ASIDE.sub(set_aside, text))
+    text = CSS_PUNCTUATION.sub(r'\1', text).replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda match: strings[int(match.group(1))], text)
+
+
+def minify_js(text):
+    # Scripts are only minified with rjsmin, most sources already ship minified
+    return rjsmin.jsmin(text) if rjsmin else text
+
+
+def fingerprint(name, data):
+    stem, extension = posixpath.splitext(name)
+    return '{0}.{1}{2}'.format(stem, hashlib.sha256(data).hexdigest()[:12], extension)
+
+
+def rewrite_urls(css, source, bundle, manifest):
+    # Points the url() of a stylesheet moved into a bundle to the
+    # fingerprinted files, relative to where the bundle is written
+    def replace(match):
+        target = match.group(2)
+        path = re.split(r'[?#]', target, 1)[0]
+        if '://' in target or target.startswith(('data:', '/')):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        if resolved not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[resolved], posixpath.dirname(bundle))
+        return 'url("{0}{1}")'.format(relative, target[len(path):])
+    return CSS_URL.sub(replace, css)
+
+
+class Build:
+    '''
+    Writes the fingerprinted assets of a static folder to its dist
+    directory and returns the manifest. Earlier builds are kept, pages
+    rendered before a deploy may still reference their files.
+    '''
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.output = os.path.join(static_folder, DIST)
+        self.manifest = {}
+
+    def read(self, name):
+        with open(os.path.join(self.static_folder, name), 'rb') as source:
+            return source.read()
+
+    def write(self, name, data):
+        hashed = fingerprint(name, data)
+        path = os.path.join(self.output, hashed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as output:
+            output.write(data)
+        if posixpath.splitext(name)[1] in COMPRESSIBLE:
+            self.compress(path, data)
+        self.manifest[name] = hashed
+
+    def compress(self, path, data):
+        # Variants are only kept when smaller; mtime=0 keeps builds reproducible
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as output:
+                    output.write(compressed)
+
+    def files(self):
+        for folder, directories, names in os.walk(self.static_folder):
+            if folder == self.static_folder and DIST in directories:
+                directories.remove(DIST)
+            for name in names:
+                yield os.path.relpath(os.path.join(folder, name), self.static_folder).replace(os.sep, '/')
+
+    def bundle(self, name, sources):
+        if name.endswith('.css'):
+            parts = [rewrite_urls(self.read(source).decode('utf-8'), source, name, self.manifest) for source in sources]
+            return minify_css('\n'.join(parts)).encode('utf-8')
+        return ';\n'.join(minify_js(self.read(source).decode('utf-8')) for source in sources).encode('utf-8')
+
+    def run(self):
+        # Single files first, the stylesheets of the bundles refer to them
+        for name in sorted(self.files()):
+            self.write(name, self.read(name))
+        for name, sources in BUNDLES.items():
+            self.write(name, self.bundle(name, sources))
+        with open(os.path.join(self.output, MANIFEST), 'w') as output:
+            json.dump(self.manifest, output, indent=2, sort_keys=True)
+        return self.manifest
+
+
+class Assets:
+    '''
+    Template helpers and route serving static/dist. The manifest is read
+    once, from manifest_path, so assets rebuilt while the app runs are only
+    linked after a restart.
+    '''
+
+    def __init__(self, app, manifest_path=None):
+        self.folder = os.path.join(app.static_folder, DIST)
+        self.manifest = {}
+        if manifest_path:
+            self.load(manifest_path, app.logger)
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.add_template_global(self.asset_urls, 'asset_urls')
+        app.add_url_rule(app.static_url_path + '/' + DIST + '/<path:filename>', 'assets', self.send)
+
+    def load(self, path, logger=None):
+        try:
+            with open(path) as source:
+                self.manifest = json.load(source)
+        except FileNotFoundError:
+            if logger:
+                logger.warning('No asset manifest at %s, run flask build-assets. Serving the source files', path)
+            self.manifest = {}
+
+    def asset_url(self, filename, **values):
+        if filename in self.manifest:
+            return url_for('assets', filename=self.manifest[filename], **values)
+        return url_for('static', filename=filename, **values)
+
+    def asset_urls(self, bundle):
+        # The bundle once built, its source files otherwise
+        if bundle in self.manifest:
+            return [self.asset_url(bundle)]
+        return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+    def send(self, filename):
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(self.folder, filename + suffix)):
+                response = send_from_directory(self.folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.folder, filename, mimetype=mimetype)
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,171 @@
+'''
+Benchmark of the WSGI app against the ASGI async read mode (asgi.py).
+
+Seeds venues, artists and shows, then serves the app both ways in turn and
+has 500 concurrent clients browse the listings, detail pages and search
+over keep-alive connections. The response cache is turned off (CACHE_TTL=0)
+so every page reaches the database.
+
+    python -m benchmarks.bench_asgi --database-url postgresql://localhost:5432/fyyur_bench
+
+--sync-command and --async-command change the servers, e.g. gunicorn:
+
+    --sync-command "gunicorn --workers 4 --threads 16 --bind 127.0.0.1:{port} app:app"
+'''
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, Show, refresh_show_counts
+from benchmarks.utils import parser, setup_database, bulk_insert, percentile
+
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk']
+
+
+def seed(shows, people):
+    rng = random.Random(0)
+    for model in (Venue, Artist):
+        bulk_insert(db, model, [{
+            'id': i,
+            'name': '{0} {1}'.format(model.__name__, i),
+            'city': 'City {}'.format(i % 50),
+            'state': 'CA',
+            'genres': rng.sample(GENRES, 2),
+            'seeking_talent' if model is Venue else 'seeking_venue': False,
+        } for i in range(1, people + 1)])
+    now = datetime.now()
+    bulk_insert(db, Show, [{
+        'venue_id': rng.randint(1, people),
+        'artist_id': rng.randint(1, people),
+        'start_time': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+    } for _ in range(shows)])
+    refresh_show_counts()
+
+
+def pick_path(rng, people):
+    return rng.choice([
+        '/venues',
+        '/artists',
+        '/shows',
+        '/venues/{0}'.format(rng.randint(1, people)),
+        '/artists/{0}'.format(rng.randint(1, people)),
+        '/search?search_term=Venue+{0}'.format(rng.randint(1, 99)),
+    ])
+
+
+async def get(reader, writer, path):
+    # One HTTP/1.1 request, returns the status and whether the connection stays open
+    writer.write('GET {0} HTTP/1.1\r\nHost: localhost\r\n\r\n'.format(path).encode())
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    version, status = status_line.split()[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.read()
+        return int(status), False
+    return int(status), version == b'HTTP/1.1' and headers.get('connection') != 'close'
+
+
+async def client(port, deadline, rng, people, latencies, errors):
+    connection = None
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            status, keep_alive = await get(*connection, pick_path(rng, people))
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            status, keep_alive = None, False
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status is None or status >= 500:
+            errors.append(status)
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, clients, duration, people):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    start = time.monotonic()
+    await asyncio.gather(*[
+        client(port, deadline, random.Random(number), people, latencies, errors) for number in range(clients)
+    ])
+    elapsed = time.monotonic() - start
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'errors': len(errors),
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def start_server(command, port, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, CACHE_TTL='0', FLASK_APP='app')
+    process = subprocess.Popen(command.format(python=sys.executable, port=port).split(), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('{0!r} exited with status {1}'.format(command, process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('{0!r} not listening on port {1}'.format(command, port))
+
+
+def main():
+    arguments = parser(__doc__)
+    arguments.add_argument('--shows', type=int, default=100000)
+    arguments.add_argument('--people', type=int, default=1000, help='venues, and as many artists')
+    arguments.add_argument('--clients', type=int, default=500)
+    arguments.add_argument('--duration', type=float, default=30, help='seconds of load per server')
+    arguments.add_argument('--port', type=int, default=5098)
+    arguments.add_argument('--sync-command', default='{python} -m flask run --port {port}')
+    arguments.add_argument('--async-command', default='{python} -m uvicorn asgi:application --port {port}')
+    args = arguments.parse_args()
+    with app.app_context():
+        setup_database(app, db, args.database_url)
+        seed(args.shows, args.people)
+    print('{} shows, {} venues and artists, {} clients'.format(args.shows, args.people, args.clients))
+    print('{:<8} {:>10} {:>10} {:>8} {:>10} {:>10} {:>10}'.format('', 'requests', 'req/s', 'errors', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'))
+    for label, command in (('sync', args.sync_command), ('async', args.async_command)):
+        server = start_server(command, args.port, args.database_url)
+        try:
+            result = asyncio.run(load(args.port, args.clients, args.duration, args.people))
+        finally:
+            server.terminate()
+            server.wait()
+        print('{:<8} {:>10} {:>10.1f} {:>8} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            label, result['requests'], result['rps'], result['errors'], result['p50'], result['p95'], result['p99']))
+
+
+if __name__ == '__main__':
+    main()
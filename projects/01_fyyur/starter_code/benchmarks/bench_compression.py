@@ -0,0 +1,81 @@
+'''
+Benchmark of the response compression levels.
+
+Renders the listing pages and an export once, then compresses their bodies
+with every gzip level (and brotli quality, when installed) the way the
+middleware does, reporting the size saved against the CPU time spent.
+
+    python -m benchmarks.bench_compression --database-url postgresql://localhost:5432/fyyur_bench
+'''
+import random
+
+from app import app, db, cache, Venue, Artist, refresh_show_counts
+from benchmarks.utils import parser, setup_database, bulk_insert, percentile
+from fsnd_common.compression import Compressor, brotli
+
+PATHS = ['/venues', '/artists', '/shows', '/search?search_term=Venue', '/export/venues.ndjson']
+
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk']
+
+
+def seed(people):
+    rng = random.Random(0)
+    bulk_insert(db, Venue, [{
+        'id': i,
+        'name': 'Venue {}'.format(i),
+        'city': 'City {}'.format(i % 20),
+        'state': 'CA',
+        'genres': rng.sample(GENRES, 2),
+        'seeking_talent': False,
+    } for i in range(1, people + 1)])
+    bulk_insert(db, Artist, [{
+        'id': i,
+        'name': 'Artist {}'.format(i),
+        'city': 'City {}'.format(i % 20),
+        'state': 'CA',
+        'genres': rng.sample(GENRES, 2),
+        'seeking_venue': False,
+    } for i in range(1, people + 1)])
+    refresh_show_counts()
+
+
+def compress(encoding, level, body, chunk):
+    # Fed in chunks like a streamed response, so the flushes count too
+    compressor = Compressor(encoding, level=level, brotli_quality=level)
+    size = sum(len(compressor.compress(body[start:start + chunk])) for start in range(0, len(body), chunk))
+    size += len(compressor.finish())
+    return size, compressor.cpu_time
+
+
+def main():
+    arguments = parser(__doc__)
+    arguments.add_argument('--people', type=int, default=2000, help='venues and artists seeded')
+    arguments.add_argument('--chunk', type=int, default=16384, help='bytes per streamed chunk')
+    args = arguments.parse_args()
+    with app.app_context():
+        setup_database(app, db, args.database_url)
+        seed(args.people)
+        client = app.test_client()
+        bodies = []
+        for path in PATHS:
+            cache.clear()
+            bodies.append(client.get(path).data)
+    total = sum(len(body) for body in bodies)
+    print('{0} pages, {1:.0f} KB uncompressed, {2} runs each'.format(len(bodies), total / 1024, args.runs))
+    settings = [('gzip', level) for level in range(1, 10)]
+    if brotli:
+        settings += [('br', quality) for quality in (1, 4, 6, 9)]
+    print('{:<10} {:>10} {:>16} {:>16}'.format('', 'ratio', 'cpu p50 (ms)', 'cpu ms per MB'))
+    for encoding, level in settings:
+        timings = []
+        for _ in range(args.runs):
+            results = [compress(encoding, level, body, args.chunk) for body in bodies]
+            timings.append(sum(cpu_time for size, cpu_time in results) * 1000)
+        size = sum(size for size, cpu_time in results)
+        p50 = percentile(timings, 50)
+        print('{:<10} {:>10.3f} {:>16.2f} {:>16.2f}'.format(
+            '{0} {1}'.format(encoding, level), size / total, p50, p50 * 2 ** 20 / total))
+
+
+if __name__ == '__main__':
+    main()
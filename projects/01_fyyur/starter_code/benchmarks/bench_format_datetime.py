@@ -0,0 +1,64 @@
+'''
+Micro-benchmark of the `datetime` Jinja filter.
+
+Formats the start time of every show of a 10k-show page, as the templates
+do, with the former string round trip (str(), dateutil parsing and a babel
+pattern built per call) and with the current filter.
+
+    python -m benchmarks.bench_format_datetime
+'''
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime
+from benchmarks.utils import percentile
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def render_legacy(start_times):
+    return [legacy_format_datetime(str(start_time), 'full') for start_time in start_times]
+
+
+def render(start_times):
+    return [format_datetime(start_time, 'full') for start_time in start_times]
+
+
+def timed(fn, start_times, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(start_times)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument('--rows', type=int, default=10000)
+    arguments.add_argument('--runs', type=int, default=10)
+    args = arguments.parse_args()
+    now = datetime(2021, 3, 17, 16, 19)
+    start_times = [now + timedelta(hours=i) for i in range(args.rows)]
+    assert render(start_times) == render_legacy(start_times)
+    print('{} rows per page'.format(args.rows))
+    print('{:<12} {:>12} {:>12} {:>14}'.format('', 'p50 (ms)', 'p95 (ms)', 'per row (us)'))
+    for label, fn in (('before', render_legacy), ('after', render)):
+        latencies = timed(fn, start_times, args.runs)
+        p50 = percentile(latencies, 50)
+        print('{:<12} {:>12.2f} {:>12.2f} {:>14.2f}'.format(label, p50, percentile(latencies, 95), p50 * 1000 / args.rows))
+
+
+if __name__ == '__main__':
+    main()
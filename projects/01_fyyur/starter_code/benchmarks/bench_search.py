@@ -0,0 +1,58 @@
+'''
+Benchmark of venue name search.
+
+Seeds generated venue names and compares the former unbounded ILIKE scan
+with the ranked, limited search backend (pg_trgm on PostgreSQL).
+
+    python -m benchmarks.bench_search --database-url postgresql://localhost:5432/fyyur_bench
+'''
+import random
+
+from app import app, db, Venue
+from search import search_backend
+from benchmarks.utils import parser, setup_database, bulk_insert, measure, report
+
+WORDS = ['the', 'musical', 'hop', 'park', 'square', 'live', 'music', 'coffee', 'dueling', 'pianos',
+         'bar', 'jazz', 'club', 'hall', 'lounge', 'theatre', 'garden', 'house', 'blue', 'note',
+         'red', 'rock', 'room', 'stage', 'sound', 'cellar', 'tavern', 'arena', 'union', 'social']
+TERMS = ['hop', 'music', 'jazz club', 'blue note', 'cellar', 'zzz']
+
+
+def seed(names):
+    rng = random.Random(0)
+    bulk_insert(db, Venue, [{
+        'name': ' '.join(rng.choice(WORDS) for _ in range(3)).title() + ' {}'.format(i),
+        'seeking_talent': False
+    } for i in range(names)], chunk=20000)
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute('ANALYZE "Venue"')
+        db.session.commit()
+
+
+def legacy_search():
+    for term in TERMS:
+        Venue.query.filter(Venue.name.ilike('%{0}%'.format(term))).all()
+
+
+def backend_search():
+    backend = search_backend(db.session)
+    for term in TERMS:
+        backend.search(Venue.name, term)
+
+
+def main():
+    arguments = parser(__doc__)
+    arguments.add_argument('--names', type=int, default=1000000)
+    args = arguments.parse_args()
+    with app.app_context():
+        setup_database(app, db, args.database_url)
+        seed(args.names)
+        print('{} venue names, {} search terms per run'.format(args.names, len(TERMS)))
+        report([
+            ('before', measure(db, legacy_search, args.runs)),
+            ('after', measure(db, backend_search, args.runs)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+'''
+Benchmark of template loading under the development and production profiles.
+
+Each profile runs in a fresh process, as a newly started worker would. The
+first render of every page (loading and compiling its templates) is timed,
+then the steady-state cost of rendering the pages again. Production is
+measured with an empty bytecode cache and after flask precompile-templates.
+
+    python -m benchmarks.bench_templates
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.utils import percentile
+
+
+def pages():
+    # Template and context of the pages rendered, with sample data
+    from forms import VenueForm
+    now = datetime(2021, 3, 17, 16, 19)
+    shows = [{
+        'venue_id': i, 'venue_name': 'Venue {}'.format(i),
+        'artist_id': i, 'artist_name': 'Artist {}'.format(i), 'artist_image_link': '',
+        'start_time': now + timedelta(days=i),
+    } for i in range(30)]
+    venue = {
+        'id': 1, 'name': 'The Musical Hop', 'genres': ['Jazz', 'Swing'], 'address': '1015 Folsom Street',
+        'city': 'San Francisco', 'state': 'CA', 'phone': '123-123-1234', 'website': '', 'facebook_link': '',
+        'seeking_talent': True, 'seeking_description': '', 'image_link': '',
+        'past_shows': shows[:15], 'upcoming_shows': shows[15:], 'past_shows_count': 15, 'upcoming_shows_count': 15,
+    }
+    areas = [{'city': 'City {}'.format(i), 'state': 'CA', 'venues': [
+        {'id': i, 'name': 'Venue {}'.format(i), 'num_upcoming_shows': 2}]} for i in range(20)]
+    return [
+        ('pages/home.html', {}),
+        ('pages/venues.html', {'areas': areas}),
+        ('pages/show_venue.html', {'venue': venue}),
+        ('pages/shows.html', {'shows': shows, 'next_cursor': None}),
+        ('forms/new_venue.html', {'form': VenueForm}),
+    ]
+
+
+def child(runs):
+    # Runs in the measured process, prints its timings as JSON
+    from flask import render_template
+    from app import app
+
+    def render_all(contexts):
+        for name, context in contexts:
+            if 'form' in context:
+                context = dict(context, form=context['form']())
+            render_template(name, **context)
+
+    with app.test_request_context('/'):
+        contexts = pages()
+        start = time.perf_counter()
+        render_all(contexts)
+        first = (time.perf_counter() - start) * 1000
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            render_all(contexts)
+            latencies.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({'first': first, 'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95)}))
+
+
+def measure(env, runs):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_templates', '--child', '--runs', str(runs)],
+        env=dict(os.environ, PYTHONWARNINGS='ignore', **env),
+        check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__)
+    arguments.add_argument('--runs', type=int, default=200)
+    arguments.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = arguments.parse_args()
+    if args.child:
+        return child(args.runs)
+    cache_dir = tempfile.mkdtemp(prefix='fyyur-templates-')
+    development = {'FYYUR_PROFILE': 'development', 'DATABASE_URL': 'sqlite://'}
+    production = {'FYYUR_PROFILE': 'production', 'TEMPLATE_CACHE_DIR': cache_dir, 'DATABASE_URL': 'sqlite://'}
+    results = [
+        ('development', measure(development, args.runs)),
+        ('prod, cold', measure(production, args.runs)),
+    ]
+    subprocess.run([sys.executable, '-m', 'flask', 'precompile-templates'],
+                   env=dict(os.environ, FLASK_APP='app', PYTHONWARNINGS='ignore', **production),
+                   check=True, stdout=subprocess.DEVNULL)
+    results.append(('prod, warm', measure(production, args.runs)))
+    print('{} pages, steady state over {} runs'.format(len(pages()), args.runs))
+    print('{:<14} {:>16} {:>12} {:>12}'.format('', 'first (ms)', 'p50 (ms)', 'p95 (ms)'))
+    for label, result in results:
+        print('{:<14} {:>16.2f} {:>12.2f} {:>12.2f}'.format(label, result['first'], result['p50'], result['p95']))
+
+
+if __name__ == '__main__':
+    main()
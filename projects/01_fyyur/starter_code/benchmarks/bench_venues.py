@@ -0,0 +1,67 @@
+'''
+Benchmark of the /venues data path.
+
+Seeds venues spread over a fixed number of cities plus some upcoming shows and
+compares the former per-area queries with the single query reading the
+materialized counters.
+
+    python -m benchmarks.bench_venues --database-url postgresql://localhost:5432/fyyur_bench
+'''
+import random
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, Show, venue_areas, refresh_show_counts
+from benchmarks.utils import parser, setup_database, bulk_insert, measure, report
+
+
+def legacy_venue_areas():
+    # Former implementation: one query for the areas plus one per area
+    areas = db.session.query(Venue.city, Venue.state).distinct(Venue.city, Venue.state).order_by(Venue.state).all()
+    data = []
+    for area in areas:
+        venues = Venue.query.filter_by(state=area.state).filter_by(city=area.city).order_by(Venue.name).all()
+        data.append({
+            'city': area.city,
+            'state': area.state,
+            'venues': venues
+        })
+    return data
+
+
+def seed(venues, cities, shows):
+    rng = random.Random(0)
+    bulk_insert(db, Venue, [{
+        'id': i,
+        'name': 'Venue {}'.format(i),
+        'city': 'City {}'.format(i % cities),
+        'state': 'S{}'.format(i % 50),
+        'seeking_talent': False
+    } for i in range(1, venues + 1)])
+    bulk_insert(db, Artist, [{'id': 1, 'name': 'Artist 1', 'seeking_venue': False}])
+    now = datetime.now()
+    bulk_insert(db, Show, [{
+        'artist_id': 1,
+        'venue_id': rng.randint(1, venues),
+        'start_time': now + timedelta(days=rng.randint(-365, 365))
+    } for _ in range(shows)])
+
+
+def main():
+    arguments = parser(__doc__)
+    arguments.add_argument('--venues', type=int, default=50000)
+    arguments.add_argument('--cities', type=int, default=2000)
+    arguments.add_argument('--shows', type=int, default=100000)
+    args = arguments.parse_args()
+    with app.app_context():
+        setup_database(app, db, args.database_url)
+        seed(args.venues, args.cities, args.shows)
+        refresh_show_counts()
+        print('{} venues in {} cities, {} shows'.format(args.venues, args.cities, args.shows))
+        report([
+            ('before', measure(db, legacy_venue_areas, args.runs)),
+            ('after', measure(db, venue_areas, args.runs)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from fsnd_common.stats import percentile
+
+
+def parser(description):
+    # Every benchmark drops and recreates the tables, so the database has to be explicit
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--database-url', required=True,
+                        help='throwaway database, its tables are dropped and recreated')
+    parser.add_argument('--runs', type=int, default=50, help='timed runs per implementation')
+    return parser
+
+
+def setup_database(app, db, database_url):
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if db.engine.dialect.name == 'postgresql':
+        # The name search indexes are built with gin_trgm_ops
+        db.engine.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    db.drop_all()
+    db.create_all()
+
+
+def bulk_insert(db, model, rows, chunk=5000):
+    # Core executemany inserts, seeding through the ORM would dominate the run
+    for start in range(0, len(rows), chunk):
+        db.session.execute(model.__table__.insert(), rows[start:start + chunk])
+    db.session.commit()
+
+
+@contextmanager
+def count_queries(engine):
+    counter = {'queries': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['queries'] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def measure(db, fn, runs):
+    # One warm-up call, then the query count of a single call and the latency of every run
+    fn()
+    db.session.remove()
+    with count_queries(db.engine) as counter:
+        fn()
+    db.session.remove()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.session.remove()
+    return {
+        'queries': counter['queries'],
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+    }
+
+
+def report(results):
+    print('{:<12} {:>10} {:>12} {:>12}'.format('', 'queries', 'p50 (ms)', 'p95 (ms)'))
+    for label, result in results:
+        print('{:<12} {:>10} {:>12.2f} {:>12.2f}'.format(label, result['queries'], result['p50'], result['p95']))
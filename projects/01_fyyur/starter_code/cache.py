@@ -0,0 +1,203 @@
+import pickle
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import make_response, request, session
+
+
+class LRUCache:
+    '''
+    In-process cache evicting the least recently used entry once max_entries
+    is reached. Entries expire ttl seconds after being stored. Generation
+    counters live apart from the entries, also capped at max_entries: each
+    generation is a number never handed out before, and the namespaces
+    whose counter was dropped (or never set) share the floor, moved to a
+    new number on every drop. A namespace's generation thus never goes back
+    to a value its old entries were stored under, dropping one only costs
+    misses.
+    '''
+
+    # Private to the process, the CLI can't reach the web workers' entries
+    shared = False
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generations = OrderedDict()
+        self.counter = 0
+        self.floor = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def generation(self, key):
+        with self.lock:
+            return self.generations.get(key, self.floor)
+
+    def incr(self, key):
+        with self.lock:
+            self.counter += 1
+            self.generations[key] = self.counter
+            self.generations.move_to_end(key)
+            if len(self.generations) > self.max_entries:
+                # Drops the counter invalidated the longest ago
+                self.generations.popitem(last=False)
+                self.counter += 1
+                self.floor = self.counter
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisCache:
+    '''
+    Cache shared by every worker, stored in a Redis-compatible server. Any
+    client exposing get/setex/incr/scan_iter/delete (redis-py or a local
+    stand-in) can be passed in. Only the keys under prefix are touched, the
+    database may be shared with other apps.
+    '''
+
+    shared = True
+
+    def __init__(self, client, ttl=60, prefix='fyyur:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, pickle.dumps(value))
+
+    def generation(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        self.client.incr(self.prefix + key)
+
+    def keys(self):
+        return self.client.scan_iter(match=self.prefix + '*', count=1000)
+
+    def clear(self):
+        batch = []
+        for key in self.keys():
+            batch.append(key)
+            if len(batch) == 1000:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+    def __len__(self):
+        return sum(1 for key in self.keys())
+
+
+def cache_backend(config):
+    # Backend selected by CACHE_BACKEND in config.py
+    ttl = config.get('CACHE_TTL', 60)
+    if config.get('CACHE_BACKEND') == 'redis':
+        import redis
+        return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), ttl=ttl)
+    return LRUCache(max_entries=config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+
+
+class ResponseCache:
+    '''
+    Caches rendered pages per namespace, a route optionally followed by an
+    entity id ('shows', 'venue:1'...). Every namespace carries a generation
+    number that is part of the entry keys, so invalidating a namespace drops
+    all its entries (whatever their query string) with a single increment.
+    Entity pages also carry the generation of 'route:*', which drops the
+    pages of every entity of the route at once.
+    '''
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        # Counters of this worker, updated by its threads concurrently
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def key(self, namespace):
+        generation = self.backend.generation('generation:' + namespace)
+        if ':' in namespace:
+            route = namespace.split(':', 1)[0]
+            generation = '{0}.{1}'.format(generation, self.backend.generation('generation:{0}:*'.format(route)))
+        return '{0}:{1}:{2}'.format(namespace, generation, request.query_string.decode())
+
+    def cached(self, namespace, arg=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are specific to a visitor
+                if '_flashes' in session:
+                    return view(**kwargs)
+                key = self.key(namespace if arg is None else '{0}:{1}'.format(namespace, kwargs[arg]))
+                entry = self.backend.get(key)
+                self.record(entry is not None)
+                if entry is not None:
+                    body, status, mimetype = entry
+                    response = make_response(body, status)
+                    response.mimetype = mimetype
+                    return response
+                response = make_response(view(**kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.get_data(), response.status_code, response.mimetype))
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.incr('generation:' + namespace)
+
+    def clear(self):
+        self.backend.clear()
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'entries': len(self.backend),
+        }
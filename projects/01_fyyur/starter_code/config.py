@@ -1,13 +1,42 @@
 import os
+from fsnd_common.pool import engine_options
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# FYYUR_PROFILE=production turns debug and template reloading off and caches
+# compiled templates on disk (see flask precompile-templates)
+PROFILE = os.environ.get('FYYUR_PROFILE', 'development')
+
 # Enable debug mode.
-DEBUG = True
+DEBUG = PROFILE != 'production'
+
+# Jinja checks template files for changes on every render while this is on
+TEMPLATES_AUTO_RELOAD = DEBUG
+# Directory of the template bytecode cache, None disables it
+TEMPLATE_CACHE_DIR = None if DEBUG else os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+# Manifest of the fingerprinted assets built by flask build-assets (see
+# assets.py), None links the source files of static/ instead
+ASSETS_MANIFEST = None if DEBUG else os.path.join(basedir, 'static', 'dist', 'manifest.json')
 
 # Connect to the database
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://alanislas@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://alanislas@localhost:5432/fyyur')
+
+# Connection pool sized through the DB_POOL_* environment variables, see fsnd_common/pool.py
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# SQL profiler, see profiler.py. Requests slower than SLOW_REQUEST_MS are
+# logged with their slowest statements to SLOW_REQUEST_LOG
+SQL_PROFILER = os.environ.get('SQL_PROFILER', '').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_LOG = os.environ.get('SLOW_REQUEST_LOG', 'slow_requests.log')
+
+# Response cache, see cache.py. 'memory' keeps pages in each worker, 'redis'
+# shares them between workers through CACHE_REDIS_URL
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 60))
+CACHE_MAX_ENTRIES = 1024
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+# Tests run against an in-memory SQLite database unless told otherwise
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import app as fyyur_app, db, cache
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('fyyur')
+    group.addoption('--sizes', default='100,10000,100000',
+                    help='comma separated show counts seeded by test_query_counts.py')
+    group.addoption('--baseline', default='query_baseline.json',
+                    help='JSON file holding the route timings compared against')
+    group.addoption('--update-baseline', action='store_true',
+                    help='record the route timings of this run as the new baseline')
+
+
+@pytest.fixture
+def app():
+    fyyur_app.config['TESTING'] = True
+    fyyur_app.config['WTF_CSRF_ENABLED'] = False
+    cache.clear()
+    with fyyur_app.app_context():
+        db.create_all()
+        yield fyyur_app
+        db.session.remove()
+        db.drop_all()
+    # Forms render their csrf_token field again for the other suites
+    fyyur_app.config['WTF_CSRF_ENABLED'] = True
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Rows are stamped with updated_at before their transaction commits, so a
+# write still in flight when an export starts may carry an earlier time
+# and only become visible afterwards. The next export starts this much
+# before this one began: rows in the overlap come out twice, to be keyed by
+# id, but none is lost unless its transaction stayed open longer than that
+EXPORT_OVERLAP = timedelta(minutes=5)
+
+# As ShowForm reads start_time, so an export can be imported again
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_since(value):
+    # ISO 8601 timestamp or None, raising ValueError when malformed. Times
+    # with an offset are turned into naive UTC, as updated_at is stored
+    if not value:
+        return None
+    since = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def next_since(started):
+    # The ?since= of the export following one started at started (UTC)
+    return (started - EXPORT_OVERLAP).isoformat()
+
+
+def export_query(session, model, since=None):
+    # Every column of the table, oldest id first, streamed from a server-side
+    # cursor (yield_per) so memory stays flat whatever the table size
+    columns = list(model.__table__.columns)
+    query = session.query(*columns)
+    if since is not None:
+        query = query.filter(model.updated_at > since)
+    return columns, query.order_by(model.id).yield_per(EXPORT_BATCH_SIZE)
+
+
+def to_text(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def ndjson_lines(columns, rows):
+    keys = [column.key for column in columns]
+    for row in rows:
+        yield json.dumps({key: to_text(value) for key, value in zip(keys, row)}) + '\n'
+
+
+def csv_lines(columns, rows):
+    # Lists (genres) are written as one comma separated cell, as flask import reads them
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    for row in rows:
+        writer.writerow([','.join(value) if isinstance(value, list) else to_text(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_lines(session, model, format, since=None):
+    columns, rows = export_query(session, model, since)
+    if format == 'csv':
+        return csv_lines(columns, rows)
+    return ndjson_lines(columns, rows)
@@ -0,0 +1,132 @@
+import csv
+import json
+import os
+import time
+
+from werkzeug.datastructures import MultiDict
+
+
+class ImportSpec:
+    '''
+    How records of one kind are imported: the model receiving them, the form
+    whose validators they must pass, a function building the table row from
+    a validated form and an optional check run on every batch of rows before
+    it is written (returns the rows to keep and the rejections).
+    '''
+
+    def __init__(self, model, form_class, to_row, check=None):
+        self.model = model
+        self.form_class = form_class
+        self.to_row = to_row
+        self.check = check
+
+
+def detect_format(path):
+    return 'ndjson' if os.path.splitext(path)[1].lower() in ('.ndjson', '.jsonl', '.json') else 'csv'
+
+
+def read_records(path, format):
+    # Streams the records without loading the file in memory
+    with open(path, newline='') as source:
+        if format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for text in source:
+                if text.strip():
+                    yield json.loads(text)
+
+
+def to_formdata(record, format):
+    # Form data as a browser would post it. In CSV files several genres share
+    # one comma separated cell and booleans are spelled out
+    formdata = MultiDict()
+    for key, value in record.items():
+        if isinstance(value, list):
+            formdata.setlist(key, [str(item) for item in value])
+        elif isinstance(value, bool):
+            formdata.add(key, 'y' if value else '')
+        elif value is None:
+            continue
+        elif format == 'csv' and key == 'genres':
+            formdata.setlist(key, [item.strip() for item in value.split(',') if item.strip()])
+        elif format == 'csv' and value.lower() == 'false':
+            formdata.add(key, '')
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+class Checkpoint:
+    '''
+    Progress of an import saved next to the input file after every committed
+    batch, so an interrupted import can resume after the last written record.
+    '''
+
+    def __init__(self, path):
+        self.path = path + '.checkpoint'
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {'records': 0, 'imported': 0, 'rejected': 0}
+        with open(self.path) as checkpoint:
+            return json.load(checkpoint)
+
+    def save(self, progress):
+        with open(self.path + '.tmp', 'w') as checkpoint:
+            json.dump(progress, checkpoint)
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_import(session, spec, path, format=None, batch_size=1000, resume=True, reject=print):
+    '''
+    Validates every record of the file with the spec's form and inserts the
+    valid ones batch_size at a time with a single executemany per batch.
+    Rejected records are reported through reject(record_number, errors).
+    Returns the progress counters plus the elapsed time and rows per second.
+    '''
+    format = format or detect_format(path)
+    checkpoint = Checkpoint(path)
+    progress = checkpoint.load() if resume else {'records': 0, 'imported': 0, 'rejected': 0}
+    skip = progress['records']
+    imported_before = progress['imported']
+    table = spec.model.__table__
+    batch = []
+    start = time.perf_counter()
+
+    def flush():
+        rows = [row for number, row in batch]
+        if spec.check and batch:
+            rows, rejections = spec.check(session, batch)
+            for number, errors in rejections:
+                reject(number, errors)
+            progress['rejected'] += len(rejections)
+        if rows:
+            session.execute(table.insert(), rows)
+        session.commit()
+        progress['imported'] += len(rows)
+        progress['records'] = number_read
+        checkpoint.save(progress)
+        del batch[:]
+
+    number_read = 0
+    for number_read, record in enumerate(read_records(path, format), 1):
+        if number_read <= skip:
+            continue
+        form = spec.form_class(formdata=to_formdata(record, format), meta={'csrf': False})
+        if form.validate():
+            batch.append((number_read, spec.to_row(form)))
+        else:
+            reject(number_read, form.errors)
+            progress['rejected'] += 1
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    checkpoint.clear()
+    elapsed = time.perf_counter() - start
+    progress['seconds'] = elapsed
+    progress['rows_per_second'] = ((progress['imported'] - imported_before) / elapsed) if elapsed else 0.0
+    return progress
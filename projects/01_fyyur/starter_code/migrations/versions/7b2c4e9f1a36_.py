@@ -0,0 +1,37 @@
+"""materialized show counters on venues and artists
+
+Revision ID: 7b2c4e9f1a36
+Revises: 2d6f0b8e4a19
+Create Date: 2026-10-18 15:21:33.940182
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2c4e9f1a36'
+down_revision = '2d6f0b8e4a19'
+branch_labels = None
+depends_on = None
+
+COUNTERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    for table, foreign_key in COUNTERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        # Backfill, flask refresh-show-counts keeps them current afterwards
+        op.execute(
+            'UPDATE "{0}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id AND "Show".start_time > now()), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id AND "Show".start_time <= now())'
+            .format(table, foreign_key)
+        )
+
+
+def downgrade():
+    for table, foreign_key in COUNTERS:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,36 @@
+"""Show.start_time NOT NULL, the keyset cursor of /shows is built from it; fails on shows without one
+
+Revision ID: 8e5d2a7c1f93
+Revises: 3f8a1c6d2b74
+Create Date: 2026-10-18 21:12:05.318440
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e5d2a7c1f93'
+down_revision = '3f8a1c6d2b74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Shows without a time are left for someone to fix or delete, the
+    # migration won't drop bookings on its own
+    missing = op.get_bind().execute(
+        sa.text('SELECT id, venue_id, artist_id FROM "Show" WHERE start_time IS NULL ORDER BY id')).fetchall()
+    if missing:
+        raise RuntimeError(
+            '{0} shows have no start_time, set one or delete them before upgrading '
+            '(id, venue_id, artist_id): {1}'.format(len(missing), ', '.join(str(tuple(row)) for row in missing)))
+    op.alter_column('Show', 'start_time',
+               existing_type=sa.DateTime(),
+               nullable=False)
+
+
+def downgrade():
+    op.alter_column('Show', 'start_time',
+               existing_type=sa.DateTime(),
+               nullable=True)
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestProfile:
+    '''
+    Statements run while serving one request: how many, the time spent in
+    the database and the slowest few, kept for the slow-request log.
+    '''
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+
+    def record(self, statement, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        self.slowest.append((seconds, ' '.join(statement.split())))
+        self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+        del self.slowest[self.keep:]
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line, with the fields passed through extra={'fields': ...}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def log_handler(path):
+    handler = logging.FileHandler(path)
+    handler.setFormatter(JsonFormatter())
+    handler.setLevel(logging.INFO)
+    return handler
+
+
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append((statement, time.perf_counter()))
+
+
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()[1]
+    if has_request_context():
+        profile = g.get('sql_profile')
+        if profile is not None:
+            profile.record(statement, elapsed)
+
+
+def forget_query(context):
+    # A failed statement never reaches after_cursor_execute, its start would
+    # shift the timings of every later statement on the connection
+    if context.connection is not None:
+        starts = context.connection.info.get('query_start')
+        if starts and starts[-1][0] == context.statement:
+            starts.pop()
+
+
+LISTENERS = [('before_cursor_execute', start_query), ('after_cursor_execute', end_query), ('handle_error', forget_query)]
+
+
+class QueryProfiler:
+    '''
+    Opt-in (SQL_PROFILER) per-request SQL profiling. Adds a Server-Timing
+    header with the query count and database time to every response and logs
+    requests slower than SLOW_REQUEST_MS, with their slowest statements, as
+    JSON lines to SLOW_REQUEST_LOG. Statements run while a streamed response
+    is being sent come after the headers and are not counted.
+    '''
+
+    def __init__(self, app):
+        self.threshold = app.config.get('SLOW_REQUEST_MS', 500) / 1000.0
+        self.logger = logging.getLogger('fyyur.slow_requests')
+        self.logger.setLevel(logging.INFO)
+        path = os.path.abspath(app.config.get('SLOW_REQUEST_LOG', 'slow_requests.log'))
+        # The logger is global, each app profiled must not log every line again
+        if not any(getattr(handler, 'baseFilename', None) == path for handler in self.logger.handlers):
+            self.logger.addHandler(log_handler(path))
+        # Statements are only timed once a profiler exists
+        for name, listener in LISTENERS:
+            if not event.contains(Engine, name, listener):
+                event.listen(Engine, name, listener)
+        app.before_request(self.start)
+        app.after_request(self.finish)
+
+    def start(self):
+        g.sql_profile = RequestProfile()
+        g.request_start = time.perf_counter()
+
+    def finish(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        elapsed = time.perf_counter() - g.pop('request_start')
+        response.headers.add('Server-Timing', 'db;dur={0:.1f};desc="{1} queries"'.format(profile.db_time * 1000, profile.queries))
+        response.headers.add('Server-Timing', 'app;dur={0:.1f}'.format(elapsed * 1000))
+        if elapsed >= self.threshold:
+            self.logger.warning('slow request', extra={'fields': {
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 1),
+                'queries': profile.queries,
+                'db_ms': round(profile.db_time * 1000, 1),
+                'slowest': [{'ms': round(seconds * 1000, 1), 'sql': statement} for seconds, statement in profile.slowest],
+            }})
+        return response
+
+
+@contextmanager
+def assert_max_queries(limit):
+    '''
+    Test helper failing when the enclosed block (usually one test client
+    request) runs more than limit statements.
+
+        with assert_max_queries(2):
+            client.get('/venues')
+    '''
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+    assert len(statements) <= limit, '{0} queries run, at most {1} expected:\n{2}'.format(
+        len(statements), limit, '\n'.join(statements))
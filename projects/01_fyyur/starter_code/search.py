@@ -0,0 +1,121 @@
+from sqlalchemy import String, case, cast, func, literal, or_, union_all
+from sqlalchemy.dialects import postgresql
+
+# Upper bound of results returned by a single search
+SEARCH_RESULTS_LIMIT = 50
+
+
+def like_pattern(term):
+    # Substring pattern with the LIKE wildcards of the term escaped
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%{0}%'.format(escaped)
+
+
+class SearchBackend:
+    '''
+    Ranked, limited, case-insensitive substring search over a text column.
+    Subclasses decide how matches are scored (lower is better) and how the
+    genres filter is expressed.
+    '''
+
+    def __init__(self, session):
+        self.session = session
+
+    def score(self, column, term):
+        raise NotImplementedError
+
+    def rank(self, column, term):
+        return self.score(column, term), column
+
+    def genres_filter(self, column, genres):
+        raise NotImplementedError
+
+    def query(self, column, term):
+        # Instances of the model of the column, best match first
+        return self.session.query(column.class_) \
+            .filter(column.ilike(like_pattern(term), escape='\\')) \
+            .order_by(*self.rank(column, term))
+
+    def search(self, column, term, limit=SEARCH_RESULTS_LIMIT):
+        return self.query(column, term).limit(limit).all()
+
+    def search_counted(self, column, term, limit=SEARCH_RESULTS_LIMIT):
+        # The best matches and the number of all of them, the window count
+        # being taken before the limit, in one query
+        rows = self.query(column, term).add_columns(func.count().over()).limit(limit).all()
+        return [row[0] for row in rows], rows[0][1] if rows else 0
+
+    def filtered(self, kind, model, term=None, city=None, state=None, genres=None):
+        # One arm of the cross-entity search: (kind, id, name, city, state, score)
+        score = self.score(model.name, term) if term else literal(0)
+        query = self.session.query(
+            literal(kind).label('kind'),
+            model.id,
+            model.name,
+            model.city,
+            model.state,
+            score.label('score')
+        )
+        if term:
+            query = query.filter(model.name.ilike(like_pattern(term), escape='\\'))
+        # Equality on state and city so the (state, city) index can be used
+        if state:
+            query = query.filter(model.state == state)
+        if city:
+            query = query.filter(model.city == city)
+        if genres:
+            query = query.filter(self.genres_filter(model.genres, genres))
+        return query
+
+    def search_all(self, models, page=1, per_page=SEARCH_RESULTS_LIMIT, **filters):
+        # Ranked page over every model at once; models maps a kind to its model.
+        # One extra row is fetched so callers can tell whether a next page exists
+        results = union_all(*[
+            self.filtered(kind, model, **filters).statement for kind, model in models.items()
+        ]).alias('results')
+        return self.session.query(results) \
+            .order_by(results.c.score, results.c.name, results.c.kind, results.c.id) \
+            .limit(per_page + 1) \
+            .offset((page - 1) * per_page)
+
+
+class TrigramSearch(SearchBackend):
+    '''
+    PostgreSQL backend. ILIKE is answered by the pg_trgm GIN index on the
+    column and matches are ranked by trigram similarity to the term. Genres
+    are matched with the array overlap operator, backed by a GIN index.
+    '''
+
+    def score(self, column, term):
+        return 1 - func.similarity(column, term)
+
+    def genres_filter(self, column, genres):
+        return column.op('&&')(cast(postgresql.array(genres), postgresql.ARRAY(String)))
+
+
+class LikeSearch(SearchBackend):
+    '''
+    Fallback for databases without pg_trgm (SQLite in tests). Ranks exact
+    matches first, then prefix matches, then shorter names. Genres are
+    stored as JSON, so they are matched on their serialized form.
+    '''
+
+    def score(self, column, term):
+        lowered = func.lower(column)
+        return case([
+            (lowered == term.lower(), 0),
+            (lowered.like(like_pattern(term.lower())[1:], escape='\\'), 1),
+        ], else_=2)
+
+    def rank(self, column, term):
+        return self.score(column, term), func.length(column), column
+
+    def genres_filter(self, column, genres):
+        return or_(*[cast(column, String).like(like_pattern('"{0}"'.format(genre)), escape='\\') for genre in genres])
+
+
+def search_backend(session):
+    # Picking the backend from the dialect the session is bound to
+    if session.bind.dialect.name == 'postgresql':
+        return TrigramSearch(session)
+    return LikeSearch(session)
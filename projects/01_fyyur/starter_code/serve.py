@@ -0,0 +1,15 @@
+'''
+Production server of Fyyur, see fsnd_common/serve.py:
+
+    python serve.py --workers 4 --threads 8
+'''
+from fsnd_common.serve import main
+
+
+def load_app():
+    from app import app, db
+    return app, db
+
+
+if __name__ == '__main__':
+    main(load_app)
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+# The async mode needs SQLAlchemy 1.4 and an async driver, see asgi.py
+pytest.importorskip('sqlalchemy.ext.asyncio')
+pytest.importorskip('aiosqlite')
+
+from app import db, Venue, Artist, Show, refresh_show_counts
+from asgi import AsyncReads, async_engine
+
+
+@pytest.fixture
+def application(app, tmp_path):
+    # Both engines need to see the same data, so a file replaces the
+    # in-memory database for these tests
+    memory = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///{0}'.format(tmp_path / 'fyyur.db')
+    db.create_all()
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+    now = datetime.now()
+    db.session.add_all([
+        Show(venue=venue, artist=artist, start_time=now + timedelta(days=1)),
+        Show(venue=venue, artist=artist, start_time=now - timedelta(days=1)),
+    ])
+    db.session.commit()
+    refresh_show_counts()
+    yield AsyncReads(app, async_engine(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.session.remove()
+    app.config['SQLALCHEMY_DATABASE_URI'] = memory
+
+
+def requests(application, *requests):
+    # Sends (method, path) requests in one event loop, returns (status, body) pairs
+    async def send_all():
+        responses = []
+        for method, path in requests:
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            path, _, query_string = path.partition('?')
+            await application({
+                'type': 'http',
+                'method': method,
+                'path': path,
+                'query_string': query_string.encode(),
+                'headers': [(b'host', b'localhost')],
+            }, receive, send)
+            responses.append((messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])))
+        await application.engine.dispose()
+        return responses
+    return asyncio.run(send_all())
+
+
+def test_reads_render_the_flask_pages(application, client):
+    paths = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+    responses = requests(application, *[('GET', path) for path in paths])
+    for path, (status, body) in zip(paths, responses):
+        assert status == 200
+        assert body == client.get(path).data, path
+
+
+def test_search_finds_venues_and_artists(application):
+    [(status, body)] = requests(application, ('GET', '/search?search_term=a'))
+    assert status == 200
+    assert b'The Musical Hop' in body and b'Guns N Petals' in body
+
+
+def test_errors_and_writes_go_through_flask(application):
+    responses = requests(application, ('GET', '/venues/99'), ('GET', '/shows?after=bad'), ('DELETE', '/venues/1'))
+    assert [status for status, body in responses] == [404, 400, 200]
+    assert Venue.query.get(1) is None
+
+
+def test_streamed_responses_wait_for_the_client(application, monkeypatch):
+    monkeypatch.setattr('asgi.WSGI_BUFFERED_CHUNKS', 2)
+    produced = []
+
+    def stream(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        for number in range(20):
+            produced.append(number)
+            yield b'%d,' % number
+
+    async def run(disconnect_after=None):
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and message['body']:
+                # The app never gets more than the queue, the chunk being
+                # sent and the one waiting on the queue ahead
+                assert len(produced) - len(sent) <= 4
+                if len(sent) == disconnect_after:
+                    raise OSError('client went away')
+                sent.append(message['body'])
+                await asyncio.sleep(0.001)
+
+        streamed = AsyncReads(stream, application.engine)
+        scope = {'type': 'http', 'method': 'GET', 'path': '/stream', 'query_string': b'', 'headers': []}
+        try:
+            await streamed(scope, receive, send)
+        finally:
+            await application.engine.dispose()
+        return b''.join(sent)
+
+    assert asyncio.run(run()) == b''.join(b'%d,' % number for number in range(20))
+    del produced[:]
+    with pytest.raises(OSError):
+        asyncio.run(run(disconnect_after=3))
+    assert len(produced) < 20
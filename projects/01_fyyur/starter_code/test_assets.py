@@ -0,0 +1,80 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+from app import app as fyyur_app, assets
+from assets import Build, fingerprint, minify_css, rewrite_urls
+
+
+@pytest.fixture(scope='module')
+def build(tmp_path_factory):
+    # Builds a copy of static/ once, brotli makes builds slow
+    static = str(tmp_path_factory.mktemp('assets') / 'static')
+    shutil.copytree(fyyur_app.static_folder, static, ignore=shutil.ignore_patterns('dist'))
+    return static, Build(static).run()
+
+
+@pytest.fixture
+def built(app, build, monkeypatch):
+    # Serves the build in place of static/dist
+    static, manifest = build
+    monkeypatch.setattr(assets, 'folder', os.path.join(static, 'dist'))
+    monkeypatch.setattr(assets, 'manifest', manifest)
+    return static, manifest
+
+
+def test_minify_css_keeps_strings_and_selectors():
+    css = '/* theme */\na :hover ,\nb > i {\n  content: "a  /* b */";\n  color : red;\n}\n'
+    assert minify_css(css) == 'a :hover,b>i{content: "a  /* b */";color : red}'
+
+
+def test_rewrite_urls_points_to_fingerprinted_files():
+    manifest = {'fonts/icons.woff': 'fonts/icons.0123456789ab.woff'}
+    css = "src: url('../fonts/icons.woff?v=1'), url(../fonts/missing.ttf), url(data:image/png;base64,AA==)"
+    assert rewrite_urls(css, 'css/theme.css', 'css/site.css', manifest) == (
+        'src: url("../fonts/icons.0123456789ab.woff?v=1"), url(../fonts/missing.ttf), '
+        'url(data:image/png;base64,AA==)')
+
+
+def test_build_fingerprints_and_compresses(built):
+    static, manifest = built
+    bundle = manifest['css/site.css']
+    with open(os.path.join(static, 'dist', bundle), 'rb') as output:
+        data = output.read()
+    assert bundle == fingerprint('css/site.css', data)
+    with gzip.open(os.path.join(static, 'dist', bundle + '.gz')) as compressed:
+        assert compressed.read() == data
+    assert manifest['img/front-splash.jpg'].startswith('img/front-splash.')
+    assert not os.path.exists(os.path.join(static, 'dist', manifest['img/front-splash.jpg'] + '.gz'))
+
+
+def test_pages_link_source_files_without_manifest(client):
+    body = client.get('/').get_data(as_text=True)
+    assert '/static/css/bootstrap.min.css' in body
+    assert '/static/img/front-splash.jpg' in body
+
+
+def test_pages_link_bundles_once_built(built, client):
+    static, manifest = built
+    body = client.get('/').get_data(as_text=True)
+    assert '/static/dist/' + manifest['css/site.css'] in body
+    assert '/static/dist/' + manifest['js/site.js'] in body
+    assert '/static/dist/' + manifest['img/front-splash.jpg'] in body
+    assert '/static/css/bootstrap.min.css' not in body
+
+
+def test_assets_served_immutable_and_precompressed(built, client):
+    static, manifest = built
+    url = '/static/dist/' + manifest['css/site.css']
+    plain = client.get(url)
+    assert plain.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.mimetype == 'text/css'
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.mimetype == 'text/css'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert client.get('/static/dist/css/site.000000000000.css').status_code == 404
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from fnmatch import fnmatch
+
+from app import db, cache, Venue, Artist, Show
+from cache import LRUCache, RedisCache
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+    assert lru.get('a') == 1
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+
+
+def test_lru_expires_entries():
+    lru = LRUCache(ttl=-1)
+    lru.set('a', 1)
+    assert lru.get('a') is None
+
+
+def test_lru_caps_generations_without_reusing_them():
+    lru = LRUCache(max_entries=2)
+    history = [lru.generation('venue:1')]
+    for number in range(1, 6):
+        lru.incr('venue:{}'.format(number))
+        if lru.generation('venue:1') != history[-1]:
+            history.append(lru.generation('venue:1'))
+    assert len(lru.generations) == 2
+    # Its counter was dropped, yet it never went back to a value its entries were stored under
+    assert 'venue:1' not in lru.generations
+    assert len(history) == len(set(history))
+
+
+class DictRedis(dict):
+    # The few Redis commands RedisCache uses
+    def setex(self, key, ttl, value):
+        self[key] = value
+
+    def incr(self, key):
+        self[key] = int(self.get(key) or 0) + 1
+
+    def scan_iter(self, match, count):
+        return [key for key in list(self) if fnmatch(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.pop(key, None)
+
+
+def test_redis_clear_keeps_other_apps_keys():
+    client = DictRedis({'other:session': b'1'})
+    redis = RedisCache(client)
+    redis.set('page', 'body')
+    redis.incr('generation:venues')
+    assert len(redis) == 2
+    redis.clear()
+    assert len(redis) == 0
+    assert client == {'other:session': b'1'}
+
+
+def test_pages_are_served_from_cache(client):
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+    db.session.commit()
+    assert b'The Musical Hop' in client.get('/venues').data
+    Venue.query.filter_by(name='The Musical Hop').update({'name': 'Renamed'})
+    db.session.commit()
+    # Written behind the cache's back, so the cached page is still served
+    assert b'The Musical Hop' in client.get('/venues').data
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_show_submission_invalidates_affected_pages(client):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', genres=['Rock n Roll'])
+    other = Venue(name='Park Square', city='San Francisco', state='CA', genres=['Jazz'])
+    db.session.add_all([venue, artist, other])
+    db.session.commit()
+    venue_id, artist_id, other_id = venue.id, artist.id, other.id
+    for url in ('/venues/{}'.format(venue_id), '/artists/{}'.format(artist_id), '/venues/{}'.format(other_id)):
+        client.get(url)
+    res = client.post('/shows/create', data={
+        'venue_id': venue_id,
+        'artist_id': artist_id,
+        'start_time': (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    })
+    assert res.status_code == 200
+    assert Show.query.count() == 1
+    misses = cache.stats()['misses']
+    assert b'1 Upcoming Show' in client.get('/venues/{}'.format(venue_id)).data
+    assert b'1 Upcoming Show' in client.get('/artists/{}'.format(artist_id)).data
+    client.get('/venues/{}'.format(other_id))
+    # Only the pages of the booked venue and artist were rendered again
+    assert cache.stats()['misses'] == misses + 2
+
+
+def test_route_wide_invalidation_drops_every_entity_page(client):
+    venues = [Venue(name='Venue {}'.format(i), city='San Francisco', state='CA', genres=['Jazz']) for i in range(2)]
+    db.session.add_all(venues)
+    db.session.commit()
+    urls = ['/venues/{}'.format(venue.id) for venue in venues]
+    for url in urls:
+        client.get(url)
+    misses = cache.stats()['misses']
+    cache.invalidate('venue:*')
+    for url in urls:
+        client.get(url)
+    assert cache.stats()['misses'] == misses + 2
+
+
+def test_cli_leaves_the_workers_memory_cache_alone(app, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(cache, 'invalidate', lambda *namespaces: invalidated.extend(namespaces))
+    result = app.test_cli_runner().invoke(args=['refresh-show-counts'])
+    assert 'cached pages not invalidated' in result.output
+    assert invalidated == []
+
+
+def test_cache_stats_endpoint(client):
+    client.get('/')
+    client.get('/')
+    assert client.get('/cache/stats').get_json()['hits'] == 1
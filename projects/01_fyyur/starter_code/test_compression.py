@@ -0,0 +1,126 @@
+import gzip
+import zlib
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from app import db, Venue
+from fsnd_common.compression import CompressionMiddleware, compression_stats
+
+PAGE = b'<p>The Musical Hop</p>\n' * 200
+
+
+def wsgi_app(chunks, headers=(('Content-Type', 'text/html; charset=utf-8'),)):
+    def app(environ, start_response):
+        start_response('200 OK', list(headers))
+        return iter(chunks)
+    return app
+
+
+def get(app, encoding='gzip', **options):
+    client = Client(CompressionMiddleware(app, **options), Response)
+    return client.get('/', headers={'Accept-Encoding': encoding})
+
+
+def test_pages_are_gzipped(client):
+    db.session.add_all([Venue(name='Venue {0}'.format(i), city='San Francisco', state='CA', genres=['Jazz'])
+                        for i in range(50)])
+    db.session.commit()
+    compression_stats.reset()
+    plain = client.get('/venues')
+    response = client.get('/venues', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+    stats = client.get('/metrics/compression').get_json()
+    assert stats['responses'] == {'gzip': 1}
+    assert stats['bytes_in'] == len(plain.data) and stats['bytes_out'] == len(response.data)
+
+
+def test_small_and_encoded_bodies_are_sent_as_they_are():
+    small = get(wsgi_app([b'<p>Hi</p>'], [('Content-Type', 'text/html'), ('Content-Length', '9')]))
+    assert 'Content-Encoding' not in small.headers
+    assert small.data == b'<p>Hi</p>'
+    image = get(wsgi_app([PAGE], [('Content-Type', 'image/jpeg')]))
+    assert 'Content-Encoding' not in image.headers
+    encoded = get(wsgi_app([PAGE], [('Content-Type', 'text/css'), ('Content-Encoding', 'br')]))
+    assert encoded.headers['Content-Encoding'] == 'br'
+    assert encoded.data == PAGE
+
+
+def test_clients_not_accepting_gzip_get_the_original():
+    response = get(wsgi_app([PAGE]), encoding='gzip;q=0, identity')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.data == PAGE
+
+
+def test_not_modified_responses_vary_on_accept_encoding():
+    def not_modified(environ, start_response):
+        start_response('304 NOT MODIFIED', [('ETag', 'W/"1"')])
+        return iter([])
+    response = get(not_modified)
+    assert response.status_code == 304
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_empty_bodies_are_sent_as_they_are():
+    def empty(environ, start_response):
+        # Starts the response on the first iteration, then yields nothing
+        start_response('200 OK', [('Content-Type', 'text/html')])
+        return
+        yield
+    response = get(empty)
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b''
+    with pytest.raises(RuntimeError, match='without calling start_response'):
+        get(lambda environ, start_response: [])
+
+
+def test_streams_are_compressed_chunk_by_chunk():
+    sent = []
+
+    def chunks():
+        for index in range(3):
+            sent.append(index)
+            yield PAGE
+
+    response = Client(CompressionMiddleware(wsgi_app(chunks())), Response).get(
+        '/', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    body = iter(response.response)
+    # The first chunk can be decoded before the stream goes on
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(next(body)) == PAGE
+    assert sent == [0]
+    assert decoder.decompress(b''.join(body)) == PAGE * 2
+
+
+def test_short_streams_are_sent_as_they_are():
+    response = get(wsgi_app([b'<p>', b'Hi', b'</p>']))
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'<p>Hi</p>'
+
+
+def test_level_trades_size_for_cpu():
+    fast = get(wsgi_app([PAGE]), level=1)
+    small = get(wsgi_app([PAGE]), level=9)
+    assert gzip.decompress(fast.data) == gzip.decompress(small.data) == PAGE
+    assert len(small.data) <= len(fast.data)
+
+
+def test_strong_etags_become_weak():
+    response = get(wsgi_app([PAGE], [('Content-Type', 'text/css'), ('ETag', '"abc"')]))
+    assert response.headers['ETag'] == 'W/"abc"'
+
+
+def test_brotli_is_preferred_when_installed():
+    brotli = pytest.importorskip('brotli')
+    response = get(wsgi_app([PAGE]), encoding='gzip, br')
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == PAGE
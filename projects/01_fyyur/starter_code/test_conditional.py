@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+import app as fyyur
+from app import db, Venue, Artist, Show, refresh_show_counts
+
+
+def add_booking(days=1):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', genres=['Rock n Roll'])
+    db.session.add(Show(venue=venue, artist=artist, start_time=datetime.now() + timedelta(days=days)))
+    db.session.commit()
+    return venue.id, artist.id
+
+
+def revalidate(client, path, response):
+    return client.get(path, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_unchanged_pages_answer_not_modified(client):
+    venue_id, artist_id = add_booking()
+    for path in ['/', '/venues', '/artists', '/shows', '/search?search_term=a',
+                 '/venues/{0}'.format(venue_id), '/artists/{0}'.format(artist_id)]:
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('W/"'), path
+        again = revalidate(client, path, response)
+        assert again.status_code == 304, path
+        assert again.data == b''
+        assert again.headers['ETag'] == response.headers['ETag']
+
+
+def test_writes_change_the_tag(client):
+    venue_id, artist_id = add_booking()
+    response = client.get('/venues')
+    assert client.delete('/venues/{0}'.format(venue_id)).status_code == 200
+    assert revalidate(client, '/venues', response).status_code == 200
+
+
+def test_core_statements_change_the_tag(client):
+    add_booking()
+    response = client.get('/venues')
+    db.session.execute(Venue.__table__.update().values(upcoming_shows_count=0))
+    db.session.commit()
+    refreshed = revalidate(client, '/venues', response)
+    assert refreshed.status_code == 200
+    refresh_show_counts()
+    assert revalidate(client, '/venues', refreshed).status_code == 200
+
+
+def test_rolled_back_writes_keep_the_tag(client):
+    add_booking()
+    response = client.get('/artists')
+    db.session.add(Artist(name='The Wild Sax Band', genres=['Jazz']))
+    db.session.flush()
+    db.session.rollback()
+    assert revalidate(client, '/artists', response).status_code == 304
+
+
+def test_counters_are_bumped_at_commit_in_name_order(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        add_booking()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    writes = [statement for statement, parameters in statements if statement.startswith('INSERT')]
+    bumps = [parameters[0] for statement, parameters in statements if 'table_versions' in statement]
+    # Noted while flushing, bumped once the inserts are done
+    assert bumps == ['Artist', 'Show', 'Venue']
+    assert all('table_versions' in statement for statement in writes[-3:])
+    assert not any('table_versions' in statement for statement in writes[:-3])
+
+
+def test_other_tables_keep_the_tag(client):
+    add_booking()
+    response = client.get('/artists')
+    Venue.query.first().city = 'New York'
+    db.session.commit()
+    assert revalidate(client, '/artists', response).status_code == 304
+    assert revalidate(client, '/venues', client.get('/venues')).status_code == 304
+
+
+def test_if_modified_since(client):
+    add_booking()
+    response = client.get('/venues')
+    since = response.headers['Last-Modified']
+    assert client.get('/venues', headers={'If-Modified-Since': since}).status_code == 304
+    before = 'Mon, 01 Jan 2001 00:00:00 GMT'
+    assert client.get('/venues', headers={'If-Modified-Since': before}).status_code == 200
+
+
+def test_detail_pages_change_when_a_show_starts(client, monkeypatch):
+    venue_id, artist_id = add_booking(days=1)
+    path = '/venues/{0}'.format(venue_id)
+    response = client.get(path)
+    assert 'Last-Modified' not in response.headers
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=2)
+
+    monkeypatch.setattr(fyyur, 'datetime', Later)
+    fyyur.cache.clear()
+    assert revalidate(client, path, response).status_code == 200
+
+
+def test_errors_are_not_tagged(client):
+    response = client.get('/venues/99')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from app import db, IMPORTS, Venue, Artist, Show
+from exporter import EXPORT_OVERLAP, parse_since
+from importer import run_import
+
+
+def add_venues(*names):
+    db.session.add_all([Venue(name=name, city='San Francisco', state='CA', genres=['Jazz', 'Folk']) for name in names])
+    db.session.commit()
+
+
+def test_export_streams_ndjson(client):
+    add_venues('The Musical Hop', 'Park Square')
+    res = client.get('/export/venues.ndjson')
+    assert res.status_code == 200
+    assert res.is_streamed
+    rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert [row['name'] for row in rows] == ['The Musical Hop', 'Park Square']
+    assert rows[0]['genres'] == ['Jazz', 'Folk']
+    assert 'X-Export-Next-Since' in res.headers
+
+
+def exported_names(client, since):
+    res = client.get('/export/venues.csv', query_string={'since': since})
+    return [row['name'] for row in csv.DictReader(io.StringIO(res.get_data(as_text=True)))]
+
+
+def test_export_since_only_returns_updated_rows(client):
+    add_venues('The Musical Hop', 'Park Square')
+    Venue.query.update({'updated_at': datetime.utcnow() - timedelta(hours=1)})
+    db.session.commit()
+    since = client.get('/export/venues.csv').headers['X-Export-Next-Since']
+    venue = Venue.query.filter_by(name='Park Square').one()
+    venue.updated_at = datetime.utcnow() + timedelta(seconds=1)
+    db.session.commit()
+    assert exported_names(client, since) == ['Park Square']
+
+
+def test_export_since_overlaps_the_previous_run(client):
+    add_venues('The Musical Hop')
+    Venue.query.update({'updated_at': datetime.utcnow() - timedelta(hours=1)})
+    db.session.commit()
+    since = client.get('/export/venues.csv').headers['X-Export-Next-Since']
+    # Stamped before that export started, committed once it had read the table
+    add_venues('Park Square')
+    venue = Venue.query.filter_by(name='Park Square').one()
+    venue.updated_at = parse_since(since) + EXPORT_OVERLAP - timedelta(seconds=1)
+    db.session.commit()
+    assert exported_names(client, since) == ['Park Square']
+
+
+def test_export_since_with_an_offset(client):
+    add_venues('The Musical Hop', 'Park Square')
+    now = datetime.utcnow()
+    Venue.query.filter_by(name='The Musical Hop').update({'updated_at': now - timedelta(hours=2)})
+    Venue.query.filter_by(name='Park Square').update({'updated_at': now})
+    db.session.commit()
+    # An hour ago, written as Paris summer time
+    since = (now - timedelta(hours=1)).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=2)))
+    assert exported_names(client, since.isoformat()) == ['Park Square']
+    assert parse_since(since.isoformat()) == (now - timedelta(hours=1))
+    assert parse_since('2026-10-18T10:00:00Z') == datetime(2026, 10, 18, 10)
+
+
+def test_export_rejects_bad_requests(client):
+    assert client.get('/export/venues.xml').status_code == 404
+    assert client.get('/export/venues.csv?since=yesterday').status_code == 400
+
+
+def test_csv_export_can_be_imported(client, tmp_path):
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+                         genres=['Jazz', 'Folk'], facebook_link='https://www.facebook.com/TheMusicalHop'))
+    db.session.commit()
+    path = tmp_path / 'venues.csv'
+    path.write_bytes(client.get('/export/venues.csv').data)
+    assert run_import(db.session, IMPORTS['venues'], str(path))['imported'] == 1
+    assert [venue.genres for venue in Venue.query] == [['Jazz', 'Folk'], ['Jazz', 'Folk']]
+
+
+def test_show_export_can_be_imported(client, tmp_path):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', genres=['Rock n Roll'])
+    db.session.add(Show(venue=venue, artist=artist, start_time=datetime(2035, 4, 1, 20, 30)))
+    db.session.commit()
+    paths = []
+    for format in ('csv', 'ndjson'):
+        paths.append(tmp_path / 'shows.{}'.format(format))
+        paths[-1].write_bytes(client.get('/export/shows.{}'.format(format)).data)
+    for path in paths:
+        assert run_import(db.session, IMPORTS['shows'], str(path))['imported'] == 1
+    assert [show.start_time for show in Show.query] == [datetime(2035, 4, 1, 20, 30)] * 3
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from app import format_datetime
+
+
+def test_format_datetime_accepts_datetimes():
+    assert format_datetime(datetime(2035, 4, 1, 20, 0), 'full') == 'Sunday April, 1, 2035 at 8:00PM'
+
+
+def test_format_datetime_still_parses_strings():
+    assert format_datetime('2035-04-01 20:00:00', 'medium') == format_datetime(datetime(2035, 4, 1, 20, 0), 'medium')
@@ -0,0 +1,63 @@
+import json
+
+from app import db, IMPORTS, Venue, Artist, Show
+from importer import Checkpoint, run_import
+
+VENUE = {
+    'name': 'The Musical Hop',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1015 Folsom Street',
+    'phone': '123-123-1234',
+    'genres': ['Jazz', 'Reggae'],
+    'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+    'seeking_talent': True,
+}
+
+
+def write_ndjson(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    return str(path)
+
+
+def test_import_validates_with_the_forms(app, tmp_path):
+    path = write_ndjson(tmp_path / 'venues.ndjson', [VENUE, dict(VENUE, name='Bad phone', phone='12345'), dict(VENUE, state='XX')])
+    rejected = []
+    progress = run_import(db.session, IMPORTS['venues'], path, batch_size=2, reject=lambda number, errors: rejected.append(number))
+    assert (progress['imported'], progress['rejected']) == (1, 2)
+    assert rejected == [2, 3]
+    venue = Venue.query.one()
+    assert venue.genres == ['Jazz', 'Reggae']
+    assert venue.seeking_talent is True
+
+
+def test_import_reads_csv(app, tmp_path):
+    path = tmp_path / 'venues.csv'
+    path.write_text(
+        'name,city,state,address,genres,facebook_link,seeking_talent\n'
+        'Park Square,San Francisco,CA,34 Whiskey Moore Ave,"Jazz,Folk",https://www.facebook.com/PSL,false\n'
+    )
+    progress = run_import(db.session, IMPORTS['venues'], str(path))
+    assert progress['imported'] == 1
+    venue = Venue.query.one()
+    assert venue.genres == ['Jazz', 'Folk']
+    assert venue.seeking_talent is False
+
+
+def test_import_rejects_shows_of_unknown_venues(app, tmp_path):
+    db.session.add_all([Venue(name='Venue', genres=['Jazz']), Artist(name='Artist', genres=['Jazz'])])
+    db.session.commit()
+    shows = [{'venue_id': 1, 'artist_id': 1, 'start_time': '2035-04-01 20:00:00'},
+             {'venue_id': 2, 'artist_id': 1, 'start_time': '2035-04-01 20:00:00'}]
+    progress = run_import(db.session, IMPORTS['shows'], write_ndjson(tmp_path / 'shows.ndjson', shows), reject=lambda *args: None)
+    assert (progress['imported'], progress['rejected']) == (1, 1)
+    assert Show.query.one().venue_id == 1
+
+
+def test_import_resumes_after_checkpoint(app, tmp_path):
+    path = write_ndjson(tmp_path / 'venues.ndjson', [dict(VENUE, name='Venue {}'.format(i)) for i in range(5)])
+    Checkpoint(path).save({'records': 3, 'imported': 3, 'rejected': 0})
+    progress = run_import(db.session, IMPORTS['venues'], path, batch_size=1)
+    assert progress['imported'] == 5
+    assert [venue.name for venue in Venue.query.order_by(Venue.name)] == ['Venue 3', 'Venue 4']
+    assert Checkpoint(path).load()['records'] == 0
@@ -0,0 +1,27 @@
+from fsnd_common.pool import TimedQueuePool, engine_options
+
+
+def test_sqlite_keeps_default_pool():
+    options = engine_options('sqlite://', environ={})
+    assert 'poolclass' not in options
+    assert options['pool_pre_ping'] is True
+
+
+def test_postgres_pool_from_environment():
+    options = engine_options('postgresql://localhost/fyyur', environ={
+        'DB_POOL_SIZE': '20',
+        'DB_POOL_MAX_OVERFLOW': '0',
+        'DB_POOL_PRE_PING': 'false',
+        'DB_STATEMENT_TIMEOUT': '5000',
+    })
+    assert options['poolclass'] is TimedQueuePool
+    assert options['pool_size'] == 20
+    assert options['max_overflow'] == 0
+    assert options['pool_pre_ping'] is False
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+
+
+def test_metrics_route(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'checkouts' in response.get_json()['pool']
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+
+from app import db, Venue, Artist, Show, refresh_show_counts
+from profiler import QueryProfiler, assert_max_queries
+
+
+@pytest.fixture
+def bookings(app):
+    # Three venues and artists with a past and an upcoming show each, enough
+    # for an N+1 loop to show up in the query counts
+    now = datetime.now()
+    for number in range(3):
+        venue = Venue(name='Venue {}'.format(number), city='San Francisco', state='CA', genres=['Jazz'])
+        artist = Artist(name='Artist {}'.format(number), genres=['Rock n Roll'])
+        db.session.add_all([
+            Show(venue=venue, artist=artist, start_time=now + timedelta(days=1)),
+            Show(venue=venue, artist=artist, start_time=now - timedelta(days=1)),
+        ])
+    db.session.commit()
+    refresh_show_counts()
+
+
+# Pages answering conditional GETs run one more query, reading the table versions
+@pytest.mark.parametrize('path, limit', [
+    ('/venues', 2),
+    ('/artists', 2),
+    ('/shows', 2),
+    ('/venues/1', 3),
+    ('/artists/1', 3),
+    ('/search?search_term=1', 3),
+])
+def test_query_count(client, bookings, path, limit):
+    with assert_max_queries(limit):
+        assert client.get(path).status_code == 200
+
+
+def test_assert_max_queries_reports_statements(app):
+    with pytest.raises(AssertionError, match='2 queries run, at most 1 expected'):
+        with assert_max_queries(1):
+            Venue.query.all()
+            Artist.query.all()
+
+
+def test_server_timing_and_slow_request_log(tmp_path):
+    log = tmp_path / 'slow.log'
+    engine = create_engine('sqlite://')
+    profiled = Flask(__name__)
+    profiled.config.update(SLOW_REQUEST_MS=0, SLOW_REQUEST_LOG=str(log))
+    QueryProfiler(profiled)
+
+    @profiled.route('/')
+    def index():
+        engine.execute('select 1')
+        engine.execute('select 2')
+        return 'ok'
+
+    response = profiled.test_client().get('/?page=1')
+    assert '"2 queries"' in response.headers.getlist('Server-Timing')[0]
+    entry = json.loads(log.read_text().splitlines()[-1])
+    assert entry['path'] == '/?page=1'
+    assert entry['queries'] == 2
+    assert len(entry['slowest']) == 2
+
+
+def test_failed_statement_leaves_no_start_time(tmp_path):
+    engine = create_engine('sqlite://')
+    profiled = Flask(__name__)
+    profiled.config.update(SLOW_REQUEST_LOG=str(tmp_path / 'slow.log'))
+    QueryProfiler(profiled)
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute('select * from missing')
+        conn.execute('select 1')
+        assert conn.connection.info.get('query_start') == []
@@ -0,0 +1,139 @@
+'''
+Query-count regression suite. Every route is requested against databases
+seeded with a growing number of shows and must stay under the same query
+limit whatever the size, so an N+1 loop fails here before reaching
+production. Route timings are compared with a locally recorded baseline:
+
+    python -m pytest test_query_counts.py --update-baseline   # record
+    python -m pytest test_query_counts.py                     # compare
+
+Run it on PostgreSQL with DATABASE_URL pointing to a throwaway database,
+and with --sizes 100,10000 for a quicker run.
+'''
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app as fyyur_app, db, cache, Venue, Artist, Show, refresh_show_counts
+from benchmarks.utils import bulk_insert
+from profiler import assert_max_queries
+
+# A route may take up to SLOWDOWN times its baseline plus SLACK seconds
+SLOWDOWN = 1.5
+SLACK = 0.02
+RUNS = 3
+
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk']
+
+# Route and the most queries it may run, whatever the size of the database.
+# Pages answering conditional GETs run one more, reading the table versions
+ROUTES = [
+    ('/', 1),
+    ('/venues', 2),
+    ('/artists', 2),
+    ('/shows', 2),
+    ('/shows?after=2000-01-01T00:00:00_1', 2),
+    ('/venues/1', 3),
+    ('/artists/1', 3),
+    ('/venues/1/edit', 1),
+    ('/artists/1/edit', 1),
+    ('/search?search_term=Venue+1', 3),
+    ('/search?search_term=Artist&genres=Jazz&page=2', 3),
+    ('/venues/create', 0),
+    ('/artists/create', 0),
+    ('/shows/create', 0),
+    ('/export/venues.ndjson', 1),
+]
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('sizes').split(',')]
+        metafunc.parametrize('size', sizes, scope='module', ids='{}_shows'.format)
+
+
+def seed(shows):
+    # One venue and one artist per hundred shows, spread over twenty cities
+    rng = random.Random(0)
+    people = max(10, shows // 100)
+    bulk_insert(db, Venue, [{
+        'id': i,
+        'name': 'Venue {}'.format(i),
+        'city': 'City {}'.format(i % 20),
+        'state': 'CA',
+        'genres': rng.sample(GENRES, 2),
+        'seeking_talent': False,
+    } for i in range(1, people + 1)])
+    bulk_insert(db, Artist, [{
+        'id': i,
+        'name': 'Artist {}'.format(i),
+        'city': 'City {}'.format(i % 20),
+        'state': 'CA',
+        'genres': rng.sample(GENRES, 2),
+        'seeking_venue': False,
+    } for i in range(1, people + 1)])
+    now = datetime.now()
+    bulk_insert(db, Show, [{
+        'venue_id': rng.randint(1, people),
+        'artist_id': rng.randint(1, people),
+        'start_time': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+    } for _ in range(shows)])
+    refresh_show_counts()
+
+
+@pytest.fixture(scope='module')
+def seeded(size):
+    fyyur_app.config['TESTING'] = True
+    with fyyur_app.app_context():
+        db.create_all()
+        seed(size)
+        yield fyyur_app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(scope='session')
+def baseline(pytestconfig):
+    path = pytestconfig.getoption('baseline')
+    recorded = {}
+    if os.path.exists(path):
+        with open(path) as source:
+            recorded = json.load(source)
+    timings = {}
+    yield recorded, timings
+    if pytestconfig.getoption('update_baseline') and timings:
+        recorded.update(timings)
+        with open(path, 'w') as output:
+            json.dump(recorded, output, indent=2, sort_keys=True)
+
+
+def timed_get(client, path):
+    # Median over a few runs, each one missing the response cache
+    durations = []
+    for _ in range(RUNS):
+        cache.clear()
+        start = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        durations.append(time.perf_counter() - start)
+        assert response.status_code == 200, path
+    return statistics.median(durations)
+
+
+@pytest.mark.parametrize('path, limit', ROUTES, ids=[path for path, limit in ROUTES])
+def test_route(seeded, size, baseline, path, limit):
+    cache.clear()
+    with assert_max_queries(limit):
+        assert seeded.get(path).status_code == 200
+
+    recorded, timings = baseline
+    key = '{0} {1}'.format(size, path)
+    elapsed = timings[key] = timed_get(seeded, path)
+    if key in recorded:
+        allowed = recorded[key] * SLOWDOWN + SLACK
+        assert elapsed <= allowed, '{0} took {1:.3f}s, baseline {2:.3f}s'.format(key, elapsed, recorded[key])
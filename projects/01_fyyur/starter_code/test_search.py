@@ -0,0 +1,96 @@
+from app import db, Venue, Artist
+from search import LikeSearch, like_pattern, search_backend
+
+
+def add_venues(*names):
+    db.session.add_all([Venue(name=name, city='San Francisco', state='CA', genres=['Jazz']) for name in names])
+    db.session.commit()
+
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern('100%_') == '%100\\%\\_%'
+
+
+def test_sqlite_uses_fallback_backend(app):
+    assert isinstance(search_backend(db.session), LikeSearch)
+
+
+def test_search_is_case_insensitive_substring(app):
+    add_venues('The Musical Hop', 'Park Square Live Music & Coffee', 'The Dueling Pianos Bar')
+    names = [venue.name for venue in search_backend(db.session).search(Venue.name, 'music')]
+    assert sorted(names) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+
+
+def test_search_ranks_exact_and_prefix_matches_first(app):
+    add_venues('The Hop Shop', 'Hopper', 'Hop')
+    names = [venue.name for venue in search_backend(db.session).search(Venue.name, 'hop')]
+    assert names == ['Hop', 'Hopper', 'The Hop Shop']
+
+
+def test_search_is_limited(app):
+    add_venues(*['Venue {}'.format(i) for i in range(10)])
+    assert len(search_backend(db.session).search(Venue.name, 'venue', limit=3)) == 3
+
+
+def test_search_counts_every_match(app):
+    add_venues(*['Venue {}'.format(i) for i in range(10)])
+    result, count = search_backend(db.session).search_counted(Venue.name, 'venue', limit=3)
+    assert len(result) == 3 and count == 10
+    assert search_backend(db.session).search_counted(Venue.name, 'nothing') == ([], 0)
+
+
+def test_search_page_reports_matches_past_the_limit(client):
+    add_venues(*['Venue {}'.format(i) for i in range(60)])
+    response = client.post('/venues/search', data={'search_term': 'venue'})
+    assert b'Number of search results for "venue": 60' in response.data
+
+
+def test_search_does_not_treat_wildcards_as_patterns(app):
+    add_venues('100% Jazz', '100 Jazz')
+    names = [venue.name for venue in search_backend(db.session).search(Venue.name, '100%')]
+    assert names == ['100% Jazz']
+
+
+def test_search_artists_endpoint(client):
+    db.session.add_all([Artist(name=name, genres=['Jazz']) for name in ('Guns N Petals', 'The Wild Sax Band')])
+    db.session.commit()
+    res = client.post('/artists/search', data={'search_term': 'band'})
+    assert res.status_code == 200
+    assert b'The Wild Sax Band' in res.data
+    assert b'Guns N Petals' not in res.data
+
+
+def test_search_all_combines_venues_and_artists(app):
+    add_venues('Jazz Hop')
+    db.session.add(Artist(name='Hop Along', city='San Francisco', state='CA', genres=['Folk']))
+    db.session.commit()
+    results = search_backend(db.session).search_all({'venue': Venue, 'artist': Artist}, term='hop').all()
+    assert sorted((row.kind, row.name) for row in results) == [('artist', 'Hop Along'), ('venue', 'Jazz Hop')]
+
+
+def test_search_all_filters_by_area_and_genres(app):
+    db.session.add_all([
+        Venue(name='Blue Note', city='New York', state='NY', genres=['Jazz', 'Blues']),
+        Venue(name='Fillmore', city='San Francisco', state='CA', genres=['Rock n Roll']),
+        Artist(name='Sax Band', city='New York', state='NY', genres=['Jazz']),
+        Artist(name='Folk Duo', city='New York', state='NY', genres=['Folk']),
+    ])
+    db.session.commit()
+    backend = search_backend(db.session)
+    models = {'venue': Venue, 'artist': Artist}
+    in_ny = backend.search_all(models, city='New York', state='NY').all()
+    assert sorted(row.name for row in in_ny) == ['Blue Note', 'Folk Duo', 'Sax Band']
+    jazz = backend.search_all(models, state='NY', genres=['Jazz', 'Soul']).all()
+    assert sorted(row.name for row in jazz) == ['Blue Note', 'Sax Band']
+
+
+def test_search_endpoint_paginates(client):
+    add_venues(*['Venue {:02d}'.format(i) for i in range(25)])
+    first = client.get('/search?search_term=venue')
+    assert first.status_code == 200
+    body = first.get_data(as_text=True)
+    assert body.count('<h5>Venue') == 20
+    assert 'page=2' in body
+    second = client.get('/search?search_term=venue&page=2').get_data(as_text=True)
+    assert second.count('<h5>Venue') == 5
+    assert 'Next' not in second
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from app import db, Venue, Artist, Show, refresh_show_counts, show_count_drift, venue_areas
+
+
+def add_booking():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', genres=['Rock n Roll'])
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    return venue.id, artist.id
+
+
+def post_show(client, venue_id, artist_id, days):
+    return client.post('/shows/create', data={
+        'venue_id': venue_id,
+        'artist_id': artist_id,
+        'start_time': (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+
+def test_show_submission_increments_counters(client):
+    venue_id, artist_id = add_booking()
+    post_show(client, venue_id, artist_id, 1)
+    post_show(client, venue_id, artist_id, -1)
+    venue, artist = Venue.query.get(venue_id), Artist.query.get(artist_id)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (1, 1)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 1)
+    assert show_count_drift() == []
+
+
+def test_venue_listing_reads_counters(client):
+    venue_id, artist_id = add_booking()
+    post_show(client, venue_id, artist_id, 1)
+    assert client.get('/venues').status_code == 200
+    assert venue_areas()[0]['venues'][0]['num_upcoming_shows'] == 1
+
+
+def test_deleting_a_venue_decrements_its_artists(client):
+    venue_id, artist_id = add_booking()
+    post_show(client, venue_id, artist_id, 1)
+    assert client.delete('/venues/{}'.format(venue_id)).get_json()['success']
+    assert Venue.query.get(venue_id) is None
+    assert Show.query.count() == 0
+    assert Artist.query.get(artist_id).upcoming_shows_count == 0
+
+
+def test_refresh_reconciles_drift(app):
+    venue_id, artist_id = add_booking()
+    # Shows written behind the counters' back, as a bulk import would
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=datetime.now() - timedelta(days=1)))
+    db.session.commit()
+    assert [(model, id) for model, id, stored, actual in show_count_drift()] == [('Venue', venue_id), ('Artist', artist_id)]
+    assert refresh_show_counts() == 2
+    assert show_count_drift() == []
+    assert Venue.query.get(venue_id).past_shows_count == 1
@@ -0,0 +1,102 @@
+'''
+Benchmark of 100 question quiz games.
+
+Plays the same games through POST /quizzes, sending back every question
+already asked, and through a server side session, reporting the request
+body, queries and latency of each question as the game goes on.
+
+    python -m benchmarks.bench_quiz --database-url postgresql://localhost:5432/trivia_bench
+'''
+import argparse
+import json
+import time
+
+from sqlalchemy import event
+
+from fsnd_common.stats import percentile
+from flaskr import create_app
+from models import db, Question, Category
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+LENGTH = 100
+
+
+def seed(questions):
+    # Core executemany inserts, the ORM would dominate the run
+    db.session.execute(Category.__table__.insert(), [{'id': i, 'type': name} for i, name in enumerate(CATEGORIES, 1)])
+    db.session.execute(Question.__table__.insert(), [{
+        'id': i,
+        'question': 'Question {}'.format(i),
+        'answer': 'Answer {}'.format(i),
+        'category': str(i % len(CATEGORIES) + 1),
+        'difficulty': i % 5 + 1,
+    } for i in range(1, questions + 1)])
+    db.session.commit()
+
+
+def stateless(client):
+    # One game through /quizzes, yielding the request body of each question
+    previous = []
+    for _ in range(LENGTH):
+        body = json.dumps({'previous_questions': previous, 'quiz_category': {'type': 'Science', 'id': 1}})
+        question = client.post('/quizzes', data=body, content_type='application/json').get_json()['question']
+        yield len(body)
+        previous.append(question['id'])
+
+
+def sessions(client):
+    # One game through /quizzes/sessions, its first question timed along with the start of the game
+    session = client.post('/quizzes/sessions', json={'quiz_category': {'id': 1}}).get_json()['session']
+    for _ in range(LENGTH):
+        client.post('/quizzes/sessions/{0}/next'.format(session))
+        yield 0
+
+
+def play(game, client, games):
+    # Latency and queries of each question, grouped by its place in the game
+    queries = {'count': 0}
+
+    def before_cursor_execute(*args):
+        queries['count'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    latencies, sizes = [[] for _ in range(LENGTH)], [0] * LENGTH
+    try:
+        for _ in range(games):
+            turns = game(client)
+            for turn in range(LENGTH):
+                start = time.perf_counter()
+                sizes[turn] = next(turns)
+                latencies[turn].append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return latencies, sizes, queries['count'] / (games * LENGTH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', required=True,
+                        help='throwaway database, its tables are dropped and recreated')
+    parser.add_argument('--questions', type=int, default=6000, help='questions seeded, a sixth of them in the category played')
+    parser.add_argument('--games', type=int, default=20, help='games played per implementation')
+    args = parser.parse_args()
+    app = create_app({'DATABASE_PATH': args.database_url})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(args.questions)
+        client = app.test_client()
+        print('{0} questions, {1} games of {2}'.format(args.questions, args.games, LENGTH))
+        print('{:<10} {:>8} {:>14} {:>14} {:>14} {:>14}'.format(
+            '', 'queries', 'body q1 (B)', 'body q100 (B)', 'q1 p50 (ms)', 'q100 p50 (ms)'))
+        for label, game in [('stateless', stateless), ('sessions', sessions)]:
+            # One warm-up game, loading the decks
+            play(game, client, 1)
+            latencies, sizes, queries = play(game, client, args.games)
+            print('{:<10} {:>8.1f} {:>14} {:>14} {:>14.2f} {:>14.2f}'.format(
+                label, queries, sizes[0], sizes[-1], percentile(latencies[0], 50), percentile(latencies[-1], 50)))
+
+
+if __name__ == '__main__':
+    main()
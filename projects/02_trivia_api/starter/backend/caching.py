@@ -0,0 +1,79 @@
+'''
+Values cached in memory until the tables they come from are written to,
+by any worker. versions.cached(*models) values are checked against the
+counters of table_versions (see fsnd_common/versions.py); those already
+read by the conditional GET of the request are reused, so checking them
+costs no query of its own in those views.
+'''
+from functools import wraps
+from threading import Lock
+
+from flask import has_request_context, request
+
+from fsnd_common.versions import TableVersions
+
+
+class Cached:
+    '''
+    Value loaded from the tables names, kept in memory until one of their
+    counters moves (a write from any worker) or invalidate() is called.
+    '''
+
+    def __init__(self, versions, names, load):
+        self.versions = versions
+        self.names = names
+        self.load = load
+        self.lock = Lock()
+        self.version = None
+        self.value = None
+
+    def __call__(self):
+        version = self.versions.current(self.names)
+        with self.lock:
+            if version != self.version:
+                self.value = self.load()
+                self.version = version
+            return self.value
+
+    def invalidate(self):
+        with self.lock:
+            self.version = None
+            self.value = None
+
+
+class CachingVersions(TableVersions):
+    '''
+    TableVersions remembering the counters read during a request, for the
+    Cached values to check.
+    '''
+
+    def state(self, names, extra=()):
+        state = super().state(names, extra)
+        self.remember(names, state[len(state) - len(names):])
+        return state
+
+    def remember(self, names, counters):
+        # Counters read during a request, reused by current() until it ends
+        if has_request_context():
+            request.environ.setdefault('table_versions', {}).update(zip(names, counters))
+
+    def current(self, names):
+        # Counters of the tables names, only querying those not read yet in this request
+        known = request.environ.get('table_versions', {}) if has_request_context() else {}
+        missing = [name for name in names if name not in known]
+        if missing:
+            state = self.state(missing)
+            known = dict(known, **dict(zip(missing, state[2:])))
+        return tuple(known[name] for name in names)
+
+    def cached(self, *models):
+        '''
+        Decorator turning a function loading a value from the tables of
+        models into a Cached of it: called, it returns the value loaded the
+        last time, unless those tables were written to since.
+        '''
+        names = [model.__table__.name for model in models]
+
+        def decorator(load):
+            return wraps(load)(Cached(self, names, load))
+        return decorator
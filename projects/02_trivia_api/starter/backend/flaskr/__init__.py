@@ -2,9 +2,12 @@ import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category
+from models import setup_db, database_path, Question, Category, db, versions, question_total, category_registry
+from fsnd_common.pool import register_metrics
+from fsnd_common.compression import register_compression
+from quiz import decks, session_store, QuizSessions
+from search import create_index, search_questions
 
 QUESTIONS_PER_PAGE = 10
 
@@ -12,7 +15,19 @@ QUESTIONS_PER_PAGE = 10
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
-    setup_db(app)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+    setup_db(app, app.config.get('DATABASE_PATH', database_path))
+    with app.app_context():
+        category_registry.warm()
+    register_metrics(app, db)
+    register_compression(app)
+    quiz_sessions = QuizSessions(session_store())
+
+    @app.cli.command('create-search-index')
+    def create_search_index():
+        # GIN index of the question search on PostgreSQL, see search.py
+        create_index()
 
     '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -32,12 +47,10 @@ def create_app(test_config=None):
   for all available categories.
   '''
     @app.route('/categories')
+    @versions.conditional(Category)
     def get_categories():
-        # Retrieving all categories from DB
-        categories = Category.query.all()
-        # Formatting categories so they can be parsed as JSON
-        formatted_category = {category.id: category.type for category in categories}
-        return jsonify({'categories': formatted_category})
+        # Categories come from the registry, see models.py
+        return jsonify({'categories': category_registry.map()})
     '''
   @TODO: 
   Create an endpoint to handle GET requests for questions, 
@@ -51,23 +64,34 @@ def create_app(test_config=None):
   Clicking on the page numbers should update the questions. 
   '''
     @app.route('/questions', methods=['GET'])
+    @versions.conditional(Question, Category)
     def get_questions():
-        # Page is being received as parameter
-        page = request.args.get('page', 1, int)
-        # Using SQLAlchemy paginate avoiding retrieving all questions at once
-        questions = Question.query.order_by(Question.id.desc()).paginate(page, QUESTIONS_PER_PAGE, error_out=False)
-        categories = Category.query.all()
-        if not questions.items or not categories:
+        # Either the questions after the id given, costing the same however deep the page,
+        # or a page number, which still skips the questions before it
+        after_id = request.args.get('after_id', None, int)
+        questions = Question.query.order_by(Question.id.desc())
+        if after_id is not None:
+            questions = questions.filter(Question.id < after_id)
+        else:
+            page = request.args.get('page', 1, int)
+            questions = questions.offset((max(page, 1) - 1) * QUESTIONS_PER_PAGE)
+        # One more than a page tells whether another page follows
+        questions = questions.limit(QUESTIONS_PER_PAGE + 1).all()
+        more = len(questions) > QUESTIONS_PER_PAGE
+        questions = questions[:QUESTIONS_PER_PAGE]
+        # The total and the categories come from memory, see models.py
+        categories = category_registry.map()
+        if not questions or not categories:
             # If page is out of index a not found status code is returned
             abort(404)
         else:
-            # Formatting questions and categories so they can be parsed as JSON
-            formatted_questions = [question.format() for question in questions.items]
-            formatted_categories = {category.id: category.type for category in categories}
+            # Formatting questions so they can be parsed as JSON
+            formatted_questions = [question.format() for question in questions]
             return jsonify({
                 'questions': formatted_questions,
-                'total_questions': Question.query.count(),
-                'categories': formatted_categories,
+                'total_questions': question_total(),
+                'categories': categories,
+                'next_after_id': questions[-1].id if more else None,
                 'current_category': None
             })
     '''
@@ -111,15 +135,18 @@ def create_app(test_config=None):
         # Same route and method is being used for searching a question and creating a new one
         search = data.get('searchTerm', None)
         if search:
-            # Seeking question in DB as case insensitive
-            questions = Question.query.filter(Question.question.ilike('%{}%'.format(search))).all()
+            # Seeking the words in questions and answers, best matches first, see search.py
+            page = data.get('page', 1)
+            if not isinstance(page, int):
+                abort(400)
+            questions, total = search_questions(search, page, QUESTIONS_PER_PAGE)
             if not questions:
                 abort(404)
             formatted_questions = [question.format() for question in questions]
             return jsonify({
                 'success': True,
                 'questions': formatted_questions,
-                'total_questions': Question.query.count(),
+                'total_questions': total,
                 'current_category': None
             })
         else:
@@ -163,6 +190,7 @@ def create_app(test_config=None):
   category to be shown. 
   '''
     @app.route('/categories/<category_id>/questions')
+    @versions.conditional(Question)
     def get_by_category(category_id):
         # Retrieving questions from DB based on a category ID
         questions = Question.query.filter_by(category=category_id).all()
@@ -196,30 +224,47 @@ def create_app(test_config=None):
         if not data:
             abort(400)
         category = data.get('quiz_category').get('id')
-        previous = data.get('previous_questions')
+        # Ids may come as strings, they would never match the deck's ints
+        try:
+            previous = [int(id) for id in data.get('previous_questions') or []]
+        except (TypeError, ValueError):
+            abort(400)
         # If no valid category was sent, returning random question from any category
-        category_exist = Category.query.with_entities(Category.id).filter_by(id=category).first() is not None
-        if category_exist:
-            # Verifying there are some questions left within specified category
-            nquestion = Question.query.filter_by(category=category).filter(Question.id.notin_(previous)).count()
-            if nquestion != 0:
-                # Retrieving random question that has not been sent before
-                rand = random.randrange(0, nquestion)
-                question = Question.query.filter_by(category=category).filter(Question.id.notin_(previous))[rand]
-                formatted_question = question.format()
-        else: # No valid category was received
-            # Verifying there are some questions left to return
-            nquestion = Question.query.filter(Question.id.notin_(previous)).count()
-            if nquestion != 0:
-                # Retrieving random question that has not been sent before
-                rand = random.randrange(0, nquestion)
-                question = Question.query.filter(Question.id.notin_(previous))[rand]
-                formatted_question = question.format()
+        question = decks.next_question(category, previous)
+        if question is not None:
+            formatted_question = question.format()
         return jsonify({
             'question': formatted_question,
             'success': True
         })
 
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz():
+        # The questions left are kept on the server, instead of being sent back with every question
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict) or not isinstance(data.get('quiz_category') or {}, dict):
+            abort(400)
+        category = (data.get('quiz_category') or {}).get('id')
+        session, total = quiz_sessions.start(category)
+        return jsonify({
+            'session': session,
+            'total_questions': total,
+            'success': True
+        })
+
+    @app.route('/quizzes/sessions/<session>/next', methods=['POST'])
+    def next_quiz_question(session):
+        try:
+            question, remaining = quiz_sessions.next_question(session)
+        except KeyError:
+            # Unknown or expired game
+            abort(404)
+        return jsonify({
+            'question': question.format() if question else None,
+            'remaining_questions': remaining,
+            'success': True
+        })
+
     '''
   @TODO: 
   Create error handlers for all expected errors 
@@ -1,12 +1,17 @@
 import os
 from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy.exc import SQLAlchemyError
 from flask_sqlalchemy import SQLAlchemy
 import json
+from fsnd_common.pool import engine_options
+from caching import CachingVersions
 
 database_name = "trivia"
 database_path = "postgres://{}/{}".format('localhost:5432', database_name)
 
 db = SQLAlchemy()
+# Table version counters behind the ETags of the GET endpoints
+versions = CachingVersions(db)
 
 '''
 setup_db(app)
@@ -17,6 +22,7 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
     db.create_all()
@@ -46,6 +52,7 @@ class Question(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        question_total.invalidate()
 
     def update(self):
         db.session.commit()
@@ -53,6 +60,7 @@ class Question(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        question_total.invalidate()
 
     def format(self):
         return {
@@ -79,8 +87,70 @@ class Category(db.Model):
     def __init__(self, type):
         self.type = type
 
+    def insert(self):
+        db.session.add(self)
+        db.session.commit()
+        category_registry.invalidate()
+
+    def update(self):
+        db.session.commit()
+        category_registry.invalidate()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+        category_registry.invalidate()
+
     def format(self):
         return {
             'id': self.id,
             'type': self.type
         }
+
+
+'''
+Cached reads
+    kept in memory until the tables they come from are written to
+'''
+
+
+@versions.cached(Question)
+def question_total():
+    return Question.query.count()
+
+
+class CategoryRegistry:
+    '''
+    Every category, loaded once and shared by the endpoints instead of each
+    of them querying the table. The copy is versioned with the categories
+    counter of table_versions, so a write from any worker reloads it, and
+    dropped right away by invalidate(), which Category.insert(), update()
+    and delete() call.
+    '''
+
+    def __init__(self):
+        self.cached = versions.cached(Category)(self.load)
+
+    def load(self):
+        return {category.id: category.type for category in Category.query.order_by(Category.id)}
+
+    def map(self):
+        # {id: type} of every category, to be read only
+        return self.cached()
+
+    def warm(self):
+        # Loads the categories ahead of the first request, see create_app().
+        # A database without its tables yet (tests, migrations) is left
+        # to load them on first use instead
+        try:
+            self.cached()
+        except SQLAlchemyError:
+            db.session.rollback()
+
+    def invalidate(self):
+        self.cached.invalidate()
+
+
+# Warmed by create_app(), so workers forked by serve.py start with the
+# categories loaded; otherwise they load on the first request needing them
+category_registry = CategoryRegistry()
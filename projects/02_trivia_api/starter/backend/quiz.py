@@ -0,0 +1,237 @@
+'''
+Quiz question selection. The ids of every category's questions are read
+with one query into decks kept in memory, until the questions or the
+categories change (see caching.py). A question is then drawn from its
+deck without any SQL besides the version check and the primary key lookup
+of the question itself, whatever the size of the table or the number of
+questions already played.
+
+Games can also be kept on the server (QuizSessions) instead of the client
+resending every question it was asked, set up from the environment:
+
+    QUIZ_SESSION_STORE  SQLite file shared by the workers of this host, unset
+                        to keep the games in each worker's memory (serve.py
+                        sets it when starting more than one worker)
+    QUIZ_SESSION_TTL    seconds a game is kept after its last question (default 3600)
+'''
+import os
+import random
+import secrets
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import closing
+from threading import Lock, local
+
+from models import db, versions, Question, Category, category_registry
+
+TABLES = [Question.__table__.name, Category.__table__.name]
+
+
+def draw(ids, previous, rng=random):
+    '''
+    Random id of ids not in previous (a set), or None once all were played.
+    Picks at random until one wasn't played, a couple of tries on average
+    while at most half the deck is; past that the ids left are listed.
+    '''
+    if len(previous) * 2 <= len(ids):
+        while True:
+            candidate = ids[rng.randrange(len(ids))]
+            if candidate not in previous:
+                return candidate
+    remaining = [id for id in ids if id not in previous]
+    return rng.choice(remaining) if remaining else None
+
+
+class QuestionDecks:
+    '''
+    Question ids per category id (a string, as Question.category stores
+    it) plus the whole table under None, reloaded when the version of the
+    questions or categories tables moved.
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.decks = {}
+
+    def load(self):
+        decks = {None: []}
+        for category_id in category_registry.map():
+            decks[str(category_id)] = []
+        for question in db.session.query(Question.id, Question.category).order_by(Question.id):
+            decks[None].append(question.id)
+            if question.category in decks:
+                decks[question.category].append(question.id)
+        return decks
+
+    def get(self, category):
+        # Deck of the category, the whole table when it isn't a category
+        version = versions.current(TABLES)
+        with self.lock:
+            if version != self.version:
+                self.decks = self.load()
+                self.version = version
+            decks = self.decks
+        return decks.get(str(category) if category is not None else None, decks[None])
+
+    def next_question(self, category, previous, rng=random):
+        # A question of the category not in previous, None once all were played
+        ids = self.get(category)
+        previous = set(previous)
+        while True:
+            question_id = draw(ids, previous, rng)
+            if question_id is None:
+                return None
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+            # Deleted by another worker since the deck was loaded
+            previous.add(question_id)
+
+
+decks = QuestionDecks()
+
+
+class MemoryStore:
+    '''
+    Values of one worker, each dropped ttl seconds after it was last
+    written. Entries are kept in expiry order, so the expired ones are
+    evicted from the front on every write.
+    '''
+
+    def __init__(self, ttl=3600, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = Lock()
+        self.entries = OrderedDict()
+
+    def evict(self, now):
+        while self.entries:
+            key, (expires, value) = next(iter(self.entries.items()))
+            if expires > now:
+                break
+            del self.entries[key]
+
+    def set(self, key, value):
+        with self.lock:
+            now = self.clock()
+            self.evict(now)
+            self.entries[key] = (now + self.ttl, value)
+            self.entries.move_to_end(key)
+
+    def update(self, key, function):
+        # function(value) returns the new value and a result, KeyError if key expired
+        with self.lock:
+            now = self.clock()
+            self.evict(now)
+            expires, value = self.entries[key]
+            value, result = function(value)
+            self.entries[key] = (now + self.ttl, value)
+            self.entries.move_to_end(key)
+            return result
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SqliteStore:
+    '''
+    Same as MemoryStore, in a SQLite file the workers forked by serve.py
+    share, so a game can go on in any of them.
+    '''
+
+    def __init__(self, path, ttl=3600, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        # Connections can't cross threads, nor the fork of the workers
+        self.local = local()
+        with closing(sqlite3.connect(path)) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS quiz_sessions '
+                               '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS quiz_sessions_expires ON quiz_sessions (expires)')
+            connection.commit()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return connection
+
+    def set(self, key, value):
+        now = self.clock()
+        connection = self.connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM quiz_sessions WHERE expires <= ?', (now,))
+            connection.execute('INSERT OR REPLACE INTO quiz_sessions VALUES (?, ?, ?)', (key, value, now + self.ttl))
+
+    def update(self, key, function):
+        now = self.clock()
+        connection = self.connection()
+        with connection:
+            # Taking the write lock first, so two draws of a game can't interleave
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT value FROM quiz_sessions WHERE key = ? AND expires > ?',
+                                     (key, now)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            value, result = function(row[0])
+            connection.execute('UPDATE quiz_sessions SET value = ?, expires = ? WHERE key = ?',
+                               (value, now + self.ttl, key))
+        return result
+
+    def __len__(self):
+        return self.connection().execute('SELECT count(*) FROM quiz_sessions WHERE expires > ?',
+                                         (self.clock(),)).fetchone()[0]
+
+
+def session_store(environ=os.environ):
+    ttl = int(environ.get('QUIZ_SESSION_TTL', 3600))
+    path = environ.get('QUIZ_SESSION_STORE')
+    return SqliteStore(path, ttl) if path else MemoryStore(ttl)
+
+
+# Question ids are 32 bit ints, packed in the bytes stored per game
+IDS = 'i'
+ID_SIZE = array(IDS).itemsize
+
+
+def pop(value):
+    # The last id of a game's state and the state without it
+    if not value:
+        return value, (None, 0)
+    return value[:-ID_SIZE], (array(IDS, value[-ID_SIZE:])[0], len(value) // ID_SIZE - 1)
+
+
+class QuizSessions:
+    '''
+    Games whose state lives in store: the ids of the questions not asked
+    yet, shuffled when the game starts, so asking one is popping the last
+    id, then loading that question by primary key.
+    '''
+
+    def __init__(self, store, decks=decks):
+        self.store = store
+        self.decks = decks
+
+    def start(self, category, rng=random):
+        # Token of a new game of the category (any category when it isn't one) and its number of questions
+        ids = array(IDS, self.decks.get(category))
+        rng.shuffle(ids)
+        token = secrets.token_urlsafe(16)
+        self.store.set(token, ids.tobytes())
+        return token, len(ids)
+
+    def next_question(self, token):
+        # Next question of the game and the number left after it, KeyError if it expired
+        while True:
+            question_id, remaining = self.store.update(token, pop)
+            if question_id is None:
+                return None, 0
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question, remaining
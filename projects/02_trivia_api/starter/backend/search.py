@@ -0,0 +1,121 @@
+'''
+Question search over the text of the questions and their answers. Every
+word of the search term has to start a word of the question or answer, and
+matches come out best ranked first, one page at a time, along with their
+count.
+
+On PostgreSQL the text is matched through a GIN index of its tsvector
+(create_index(), run by flask create-search-index) and ranked by ts_rank,
+the page and the count coming from a single query. The 'simple' text search
+configuration keeps every word as it is written, stopwords included, so
+"what" or "a" match like any other word. Other databases, such as SQLite,
+search an inverted index kept in memory until the questions change, ranked
+by TF-IDF.
+'''
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import func, literal_column, text
+
+from models import db, versions, Question
+
+WORD = re.compile(r'[^\W_]+')
+
+# Also the expression of the index, so the planner can use it
+DOCUMENT = "to_tsvector('simple', coalesce(questions.question, '') || ' ' || coalesce(questions.answer, ''))"
+
+INDEX = [
+    # Built with the 'english' configuration, the queries can't use it
+    text('DROP INDEX IF EXISTS questions_search'),
+    text('CREATE INDEX IF NOT EXISTS questions_search_simple ON questions USING gin ({})'.format(
+        DOCUMENT.replace('questions.', ''))),
+]
+
+
+def words(text):
+    return WORD.findall((text or '').lower())
+
+
+def create_index():
+    # Other databases search the index kept in memory
+    if db.engine.dialect.name == 'postgresql':
+        for statement in INDEX:
+            db.session.execute(statement)
+        db.session.commit()
+
+
+class InvertedIndex:
+    '''
+    Question ids per word of their question and answer, with the number of
+    times the word appears. The words are also kept sorted, so those
+    starting with a prefix are a slice of them.
+    '''
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.size = 0
+        for id, question, answer in rows:
+            self.size += 1
+            for word in words(question) + words(answer):
+                self.postings[word][id] = self.postings[word].get(id, 0) + 1
+        self.vocabulary = sorted(self.postings)
+
+    def expand(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(prefix):
+            end += 1
+        return self.vocabulary[start:end]
+
+    def search(self, prefixes):
+        # Ids of the questions matching every prefix, best ranked first
+        scores = None
+        for prefix in prefixes:
+            matches = {}
+            for word in self.expand(prefix):
+                postings = self.postings[word]
+                idf = math.log(1 + self.size / len(postings))
+                for id, count in postings.items():
+                    matches[id] = matches.get(id, 0) + count * idf
+            if scores is None:
+                scores = matches
+            else:
+                scores = {id: score + matches[id] for id, score in scores.items() if id in matches}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda id: (-scores[id], -id))
+
+
+@versions.cached(Question)
+def inverted_index():
+    return InvertedIndex(db.session.query(Question.id, Question.question, Question.answer))
+
+
+def search_postgresql(prefixes, offset, limit):
+    query = func.to_tsquery('simple', ' & '.join(prefix + ':*' for prefix in prefixes))
+    document = literal_column(DOCUMENT)
+    rows = (db.session.query(Question, func.count().over())
+            .filter(document.op('@@')(query))
+            .order_by(func.ts_rank(document, query).desc(), Question.id.desc())
+            .offset(offset).limit(limit).all())
+    return [question for question, total in rows], rows[0][1] if rows else 0
+
+
+def search_index(prefixes, offset, limit):
+    ids = inverted_index().search(prefixes)
+    page = ids[offset:offset + limit]
+    questions = {question.id: question for question in Question.query.filter(Question.id.in_(page))} if page else {}
+    return [questions[id] for id in page if id in questions], len(ids)
+
+
+def search_questions(term, page=1, per_page=10):
+    # The page of questions matching term and the number of matches
+    prefixes = words(term)
+    if not prefixes:
+        return [], 0
+    offset = (max(page, 1) - 1) * per_page
+    if db.engine.dialect.name == 'postgresql':
+        return search_postgresql(prefixes, offset, per_page)
+    return search_index(prefixes, offset, per_page)
@@ -0,0 +1,33 @@
+'''
+Production server of the trivia API, see fsnd_common/serve.py:
+
+    python serve.py --workers 4 --threads 8
+
+Games kept on the server are shared by the workers through a SQLite file,
+QUIZ_SESSION_STORE or quiz_sessions.db in the instance folder, see quiz.py.
+'''
+import os
+
+from fsnd_common.serve import main
+
+# Instance folder of the flaskr app
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
+
+def load_app():
+    from flaskr import create_app
+    from models import db
+    # create_app() loads the categories, which the workers forked inherit
+    return create_app(), db
+
+
+def check(options, environ=os.environ):
+    # Each worker would keep its own games, lost to the next request that
+    # another worker answers, so they share a file unless one was named
+    if options['workers'] > 1 and not environ.get('QUIZ_SESSION_STORE'):
+        os.makedirs(INSTANCE_PATH, exist_ok=True)
+        environ['QUIZ_SESSION_STORE'] = os.path.join(INSTANCE_PATH, 'quiz_sessions.db')
+
+
+if __name__ == '__main__':
+    main(load_app, check)
@@ -1,10 +1,15 @@
 import os
+import tempfile
 import unittest
 import json
+from unittest import mock
 from flask_sqlalchemy import SQLAlchemy
 
+import serve
 from flaskr import create_app
-from models import setup_db, Question, Category
+from fsnd_common.serve import gunicorn_options
+from models import Question, Category
+from quiz import SqliteStore, session_store
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -12,11 +17,10 @@ class TriviaTestCase(unittest.TestCase):
 
     def setUp(self):
         """Define test variables and initialize app."""
-        self.app = create_app()
-        self.client = self.app.test_client
         self.database_name = "trivia_test"
         self.database_path = "postgresql://{}/{}".format('localhost:5432', self.database_name)
-        setup_db(self.app, self.database_path)
+        self.app = create_app({'DATABASE_PATH': self.database_path})
+        self.client = self.app.test_client
 
         # binds the app to the current context
         with self.app.app_context():
@@ -39,6 +43,16 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(data['categories'])
 
+    def test_get_categories_after_insert(self):
+        category = Category('Music')
+        category.insert()
+        id = category.id
+        data = json.loads(self.client().get('/categories').data)
+        category.delete()
+        self.assertEqual(data['categories'][str(id)], 'Music')
+        data = json.loads(self.client().get('/categories').data)
+        self.assertNotIn(str(id), data['categories'])
+
     def test_get_questions(self):
         res = self.client().get('/questions')
         data = json.loads(res.data)
@@ -52,6 +66,31 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(res.status_code, 404)
 
+    def test_get_questions_following_next_after_id(self):
+        # Every question once, and no empty page after the last one
+        seen = []
+        url = '/questions'
+        while url:
+            data = json.loads(self.client().get(url).data)
+            seen += [question['id'] for question in data['questions']]
+            url = '/questions?after_id={}'.format(data['next_after_id']) if data['next_after_id'] else None
+        self.assertEqual(sorted(seen), sorted(question.id for question in Question.query.all()))
+
+    def test_get_questions_after_id(self):
+        first = json.loads(self.client().get('/questions').data)
+        res = self.client().get('/questions?after_id={}'.format(first['next_after_id']))
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['questions'], json.loads(self.client().get('/questions?page=2').data)['questions'])
+        self.assertEqual(data['total_questions'], first['total_questions'])
+
+    def test_get_questions_total_after_create(self):
+        total = json.loads(self.client().get('/questions').data)['total_questions']
+        sent = {'question': 'this is just a test', 'answer': 'dummy answer', 'difficulty': 1, 'category': 1}
+        self.client().post('/questions', json=sent)
+        data = json.loads(self.client().get('/questions').data)
+        self.assertEqual(data['total_questions'], total + 1)
+
     def test_create_question(self):
         sent = {'question': 'this is just a test', 'answer': 'dummy answer', 'difficulty': 1, 'category': 1}
         res = self.client().post('/questions', json=sent)
@@ -86,6 +125,37 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_search_question_answers(self):
+        question = Question(question='Which instrument has pedals?', answer='Harpsichordion', difficulty=1, category='2')
+        question.insert()
+        id = question.id
+        try:
+            res = self.client().post('/questions', json={'searchTerm': 'harpsichord'})
+        finally:
+            question.delete()
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([question['id'] for question in data['questions']], [id])
+
+    def test_search_question_stopwords(self):
+        question = Question(question='What has pedals?', answer='A harpsichordion', difficulty=1, category='2')
+        question.insert()
+        id = question.id
+        try:
+            res = self.client().post('/questions', json={'searchTerm': 'what a harpsichordion'})
+        finally:
+            question.delete()
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([question['id'] for question in data['questions']], [id])
+
+    def test_search_question_pages(self):
+        res = self.client().post('/questions', json={'searchTerm': 'a'})
+        self.assertEqual(res.status_code, 200)
+        pages = -(-json.loads(res.data)['total_questions'] // 10)
+        res = self.client().post('/questions', json={'searchTerm': 'a', 'page': pages + 1})
+        self.assertEqual(res.status_code, 404)
+
     def test_search_invalid_question(self):
         search = {"searchTerm": "should not exist"}
         res = self.client().post('/questions', json=search)
@@ -115,6 +185,89 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertEqual(res.status_code, 200)
 
+    def test_play_quiz_skips_previous_questions(self):
+        ids = [question.id for question in Question.query.filter_by(category='1')]
+        sent = {'previous_questions': ids[1:], 'quiz_category': {'type': 'Science', 'id': 1}}
+        res = self.client().post('/quizzes', json=sent)
+        data = json.loads(res.data)
+        self.assertEqual(data['question']['id'], ids[0])
+
+    def test_play_quiz_previous_questions_as_strings(self):
+        ids = [question.id for question in Question.query.filter_by(category='1')]
+        sent = {'previous_questions': [str(id) for id in ids], 'quiz_category': {'type': 'Science', 'id': 1}}
+        res = self.client().post('/quizzes', json=sent)
+        data = json.loads(res.data)
+        self.assertIsNone(data['question'])
+
+    def test_play_quiz_invalid_previous_questions(self):
+        sent = {'previous_questions': ['first'], 'quiz_category': {'type': 'Science', 'id': 1}}
+        res = self.client().post('/quizzes', json=sent)
+        self.assertEqual(res.status_code, 400)
+
+    def test_play_quiz_all_played(self):
+        ids = [question.id for question in Question.query.all()]
+        sent = {'previous_questions': ids, 'quiz_category': {'type': 'All', 'id': 0}}
+        res = self.client().post('/quizzes', json=sent)
+        data = json.loads(res.data)
+        self.assertTrue(data['success'])
+        self.assertIsNone(data['question'])
+
+    def test_play_quiz_session(self):
+        ids = [question.id for question in Question.query.filter_by(category='1')]
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'type': 'Science', 'id': 1}})
+        data = json.loads(res.data)
+        self.assertEqual(data['total_questions'], len(ids))
+        path = '/quizzes/sessions/{}/next'.format(data['session'])
+        asked = [json.loads(self.client().post(path).data)['question']['id'] for _ in ids]
+        self.assertEqual(sorted(asked), sorted(ids))
+        data = json.loads(self.client().post(path).data)
+        self.assertIsNone(data['question'])
+        self.assertEqual(data['remaining_questions'], 0)
+
+    def test_play_quiz_session_invalid_body(self):
+        res = self.client().post('/quizzes/sessions', json=[1])
+        self.assertEqual(res.status_code, 400)
+
+    def test_play_quiz_unknown_session(self):
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        self.assertEqual(res.status_code, 404)
+
+    def test_get_categories_not_modified(self):
+        res = self.client().get('/categories')
+        self.assertTrue(res.headers['ETag'])
+        res = self.client().get('/categories', headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_get_questions_modified_after_create(self):
+        etag = self.client().get('/questions').headers['ETag']
+        sent = {'question': 'this is just a test', 'answer': 'dummy answer', 'difficulty': 1, 'category': 1}
+        self.client().post('/questions', json=sent)
+        res = self.client().get('/questions', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+
+class ServeTestCase(unittest.TestCase):
+    """serve.py checks of the gunicorn options"""
+
+    def test_default_options_share_the_games(self):
+        environ = {}
+        with tempfile.TemporaryDirectory() as instance_path, mock.patch('serve.INSTANCE_PATH', instance_path), \
+                mock.patch.dict(os.environ):
+            os.environ.pop('WEB_CONCURRENCY', None)
+            serve.check(gunicorn_options([]), environ)
+            self.assertEqual(environ['QUIZ_SESSION_STORE'], os.path.join(instance_path, 'quiz_sessions.db'))
+            self.assertIsInstance(session_store(environ), SqliteStore)
+
+    def test_named_store_and_single_worker_are_kept(self):
+        environ = {'QUIZ_SESSION_STORE': '/tmp/quiz.db'}
+        serve.check(gunicorn_options(['--workers', '4']), environ)
+        self.assertEqual(environ['QUIZ_SESSION_STORE'], '/tmp/quiz.db')
+        environ = {}
+        serve.check(gunicorn_options(['--workers', '1']), environ)
+        self.assertNotIn('QUIZ_SESSION_STORE', environ)
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
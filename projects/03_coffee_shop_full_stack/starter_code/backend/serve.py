@@ -0,0 +1,16 @@
+'''
+Production server of the coffee shop API, see fsnd_common/serve.py:
+
+    python serve.py --workers 4 --threads 8
+'''
+from fsnd_common.serve import main
+
+
+def load_app():
+    from src.api import app
+    from src.database.models import db
+    return app, db
+
+
+if __name__ == '__main__':
+    main(load_app)
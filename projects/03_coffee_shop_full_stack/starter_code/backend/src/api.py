@@ -4,11 +4,15 @@ from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_drop_and_create_all, setup_db, Drink, db, versions
+from fsnd_common.pool import register_metrics
+from fsnd_common.compression import register_compression
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
 setup_db(app)
+register_metrics(app, db)
+register_compression(app)
 CORS(app)
 
 '''
@@ -30,6 +34,7 @@ CORS(app)
 
 
 @app.route('/drinks', methods=['GET'])
+@versions.conditional(Drink)
 def get_drinks():
     drinks = Drink.query.all()
     formatted_drinks = [d.short() for d in drinks]
@@ -53,6 +58,7 @@ def get_drinks():
 
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
+@versions.conditional(Drink)
 def get_drinks_detail(jwt):
     drinks = Drink.query.all()
     formatted_drinks = [d.long() for d in drinks]
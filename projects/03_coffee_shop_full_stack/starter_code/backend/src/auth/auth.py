@@ -1,4 +1,5 @@
 import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
@@ -7,6 +8,10 @@ from urllib.request import urlopen
 AUTH0_DOMAIN = 'fsdnd-alan.us.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'coffe'
+# Local JWKS file used instead of the Auth0 one by the load tests. Only read
+# along with the explicit LOADTEST_AUTH=1 flag, a stray AUTH0_JWKS_FILE must
+# not let anyone holding a key of their own sign tokens
+JWKS_FILE = os.environ.get('AUTH0_JWKS_FILE') if os.environ.get('LOADTEST_AUTH') == '1' else None
 
 ## AuthError Exception
 '''
@@ -104,9 +109,16 @@ def check_permissions(permission, payload):
 '''
 
 
-def verify_decode_jwt(token):
+def get_jwks():
+    if JWKS_FILE:
+        with open(JWKS_FILE) as jwks:
+            return json.load(jwks)
     jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
+    return json.loads(jsonurl.read())
+
+
+def verify_decode_jwt(token):
+    jwks = get_jwks()
     unverified_header = jwt.get_unverified_header(token)
     rsa_key = {}
     if 'kid' not in unverified_header:
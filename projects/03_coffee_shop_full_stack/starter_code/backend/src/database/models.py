@@ -2,12 +2,16 @@ import os
 from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
 import json
+from fsnd_common.pool import engine_options
+from fsnd_common.versions import TableVersions
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
 db = SQLAlchemy()
+# Table version counters behind the ETags of the GET endpoints
+versions = TableVersions(db)
 
 '''
 setup_db(app)
@@ -18,8 +22,11 @@ setup_db(app)
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
+    # database.db predates the version counters
+    versions.table.create(db.engine, checkfirst=True)
 
 
 '''
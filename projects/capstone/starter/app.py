@@ -1,6 +1,8 @@
 from flask import Flask, request, abort, jsonify
 from flask_cors import CORS
-from models import setup_db, Actor, Movie
+from models import setup_db, Actor, Movie, db, versions
+from fsnd_common.pool import register_metrics
+from fsnd_common.compression import register_compression
 from auth.auth import AuthError, requires_auth
 
 
@@ -11,6 +13,7 @@ def create_app():
 
     @app.route('/actors')
     @requires_auth('get:actors')
+    @versions.conditional(Actor)
     def get_actors(jwt):
         # Retrieving all actors from DB
         actors = Actor.query.all()
@@ -19,6 +22,8 @@ def create_app():
         return jsonify({'actors': formatted_actors})
 
     setup_db(app)
+    register_metrics(app, db)
+    register_compression(app)
 
     @app.route('/actors', methods=['POST'])
     @requires_auth('post:actor')
@@ -84,6 +89,7 @@ def create_app():
 
     @app.route('/movies')
     @requires_auth('get:movies')
+    @versions.conditional(Movie)
     def get_movies(jwt):
         # Retrieving all movies from DB
         movies = Movie.query.all()
@@ -178,5 +184,6 @@ def create_app():
 
 APP = create_app()
 
+# Development server, production runs python serve.py
 if __name__ == '__main__':
     APP.run(host='127.0.0.1', port=8080, debug=True)
@@ -1,11 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Column, Integer, String, DateTime
 from flask_migrate import Migrate
+from fsnd_common.pool import engine_options
+from fsnd_common.versions import TableVersions
 
 database_name = "capstone"
 database_path = "postgresql://{}/{}".format('localhost:5432', database_name)
 
 db = SQLAlchemy()
+# Table version counters behind the ETags of the GET endpoints
+versions = TableVersions(db)
 
 '''
 setup_db(app)
@@ -16,6 +20,7 @@ setup_db(app)
 def setup_db(app, db_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = db_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(db_path)
     db.app = app
     db.init_app(app)
     Migrate(app, db)
@@ -86,6 +86,24 @@ class CastingAgency(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_get_movies_not_modified(self):
+        """Answers 304 when the movies didn't change since the last request"""
+        res = self.client().get('/movies')
+        res = self.client().get('/movies', headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_get_actors_modified_after_create(self):
+        """A new actor changes the ETag of the actor list"""
+        etag = self.client().get('/actors').headers['ETag']
+        sent = {'age': 25,
+                'gender': "Male",
+                'name': "Alan"}
+        self.client().post('/actors', json=sent)
+        res = self.client().get('/actors', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
     def test_delete_movie(self):
         """Successfully deletes movie with id 2"""
         res = self.client().delete('/movies/2')
@@ -0,0 +1,11 @@
+'''
+Modules shared by the four projects, installed into each project's
+environment from its requirements.txt (capstone has none, install it with
+pip install -e ../../common from projects/capstone/starter):
+
+    compression     gzip and brotli response compression
+    pool            connection pool settings and GET /metrics
+    serve           preforking gunicorn server run by each serve.py
+    stats           percentiles of the benchmarks and load tests
+    versions        table version counters and conditional GET
+'''
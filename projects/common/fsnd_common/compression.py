@@ -0,0 +1,237 @@
+'''
+Response compression for every worker, set up from the environment:
+
+    COMPRESS_LEVEL          gzip level, 1 (fastest) to 9 (smallest) (default 6)
+    COMPRESS_BROTLI_QUALITY brotli quality, 0 to 11 (default 4)
+    COMPRESS_MIN_SIZE       bodies under this many bytes are sent as they are (default 1024)
+
+Brotli is offered when the brotli package is installed, gzip otherwise.
+Responses with a Content-Length are compressed in one go; streamed ones
+are compressed chunk by chunk, each chunk flushed so the client still gets
+it right away. GET /metrics/compression reports the bytes saved and the
+CPU time spent, to pick the levels.
+'''
+import os
+import re
+import time
+import zlib
+from threading import Lock
+
+from flask import jsonify
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = re.compile(r'text/|application/(json|x-ndjson|javascript|xml|csv)|image/svg\+xml')
+
+
+def compression_options(environ=os.environ):
+    return {
+        'level': int(environ.get('COMPRESS_LEVEL', 6)),
+        'brotli_quality': int(environ.get('COMPRESS_BROTLI_QUALITY', 4)),
+        'min_size': int(environ.get('COMPRESS_MIN_SIZE', 1024)),
+    }
+
+
+class CompressionStats:
+    '''
+    Counters of one worker: responses compressed per encoding, bytes before
+    and after and the CPU time spent compressing them.
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.responses = {}
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+
+    def record(self, encoding, bytes_in, bytes_out, cpu_time):
+        with self.lock:
+            self.responses[encoding] = self.responses.get(encoding, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.cpu_time += cpu_time
+
+    def record_skip(self):
+        with self.lock:
+            self.skipped += 1
+
+    def snapshot(self):
+        return {
+            'responses': dict(self.responses),
+            'skipped': self.skipped,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': (self.bytes_out / self.bytes_in) if self.bytes_in else None,
+            'cpu_ms_total': self.cpu_time * 1000,
+            'cpu_ms_per_mb': (self.cpu_time * 1000 * 2 ** 20 / self.bytes_in) if self.bytes_in else None,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class Compressor:
+    # Streaming compressor of one response, timing the CPU it uses
+
+    def __init__(self, encoding, level, brotli_quality):
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self.steps = (lambda data: compressor.process(data) + compressor.flush(), compressor.finish)
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self.steps = (lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH),
+                          compressor.flush)
+
+    def run(self, step, *data):
+        start = time.thread_time()
+        output = step(*data)
+        self.cpu_time += time.thread_time() - start
+        self.bytes_out += len(output)
+        return output
+
+    def compress(self, data):
+        self.bytes_in += len(data)
+        return self.run(self.steps[0], data)
+
+    def finish(self):
+        output = self.run(self.steps[1])
+        compression_stats.record(self.encoding, self.bytes_in, self.bytes_out, self.cpu_time)
+        return output
+
+
+class CompressionMiddleware:
+    '''
+    WSGI middleware compressing the 200 responses of a compressible type
+    with the encoding the client prefers. The start of a streamed response
+    is held back until enough of its body arrived to tell whether it
+    reaches min_size.
+    '''
+
+    def __init__(self, app, level=6, brotli_quality=4, min_size=1024):
+        self.app = app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+
+    def negotiate(self, environ):
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return None
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        offered = (['br'] if brotli else []) + ['gzip']
+        encoding = max(offered, key=lambda encoding: accepted[encoding])
+        return encoding if accepted[encoding] else None
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ)
+        response = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            response.update(status=status, headers=headers, exc_info=exc_info)
+            return written.append
+
+        iterable = self.app(environ, capture)
+        try:
+            yield from self.respond(encoding, response, written, iterable, start_response)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    def eligible(self, response):
+        headers = {name.lower(): value for name, value in response['headers']}
+        return (response['status'].startswith('200')
+                and 'content-encoding' not in headers
+                and COMPRESSIBLE.match(headers.get('content-type', ''))
+                and 'no-transform' not in headers.get('cache-control', '')
+                and int(headers.get('content-length', self.min_size)) >= self.min_size)
+
+    def respond(self, encoding, response, pending, iterable, start_response):
+        chunks = iter(iterable)
+        # Apps may only start the response along with their first chunk
+        while not response:
+            chunk = next(chunks, None)
+            if chunk is None:
+                if response:
+                    break
+                raise RuntimeError('the app returned its body without calling start_response')
+            pending.append(chunk)
+        if not self.eligible(response):
+            compression_stats.record_skip()
+            headers = response['headers']
+            if response['status'].startswith('304'):
+                # Caches update the stored response from the 304, Vary included
+                headers = self.vary(headers)
+            start_response(response['status'], headers, response['exc_info'])
+            yield from pending
+            yield from chunks
+            return
+        headers = self.vary(response['headers'])
+        streamed = not any(name.lower() == 'content-length' for name, value in headers)
+        if streamed:
+            # Buffered until it reaches min_size or ends
+            size = sum(len(chunk) for chunk in pending)
+            while encoding and size < self.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    encoding = None
+                    break
+                pending.append(chunk)
+                size += len(chunk)
+        if not encoding:
+            compression_stats.record_skip()
+            start_response(response['status'], headers, response['exc_info'])
+            yield from pending
+            yield from chunks
+            return
+        compressor = Compressor(encoding, self.level, self.brotli_quality)
+        headers = [(name, self.weak(value) if name.lower() == 'etag' else value)
+                   for name, value in headers if name.lower() != 'content-length']
+        headers.append(('Content-Encoding', encoding))
+        if not streamed:
+            # The whole body is there already, so it keeps a Content-Length
+            body = compressor.compress(b''.join(pending + list(chunks))) + compressor.finish()
+            start_response(response['status'], headers + [('Content-Length', str(len(body)))], response['exc_info'])
+            yield body
+            return
+        start_response(response['status'], headers, response['exc_info'])
+        yield compressor.compress(b''.join(pending))
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+
+    def weak(self, etag):
+        # The compressed body differs byte for byte from the original one
+        return etag if etag.startswith('W/') else 'W/' + etag
+
+    def vary(self, headers):
+        # The response varies with Accept-Encoding, even when sent as it is
+        headers = list(headers)
+        for index, (name, value) in enumerate(headers):
+            if name.lower() == 'vary':
+                if 'accept-encoding' not in value.lower():
+                    headers[index] = (name, value + ', Accept-Encoding')
+                return headers
+        return headers + [('Vary', 'Accept-Encoding')]
+
+
+def register_compression(app, environ=os.environ):
+    # Wraps the WSGI app, and adds GET /metrics/compression with this worker's statistics
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, **compression_options(environ))
+
+    @app.route('/metrics/compression')
+    def compression_metrics():
+        return jsonify(compression_stats.snapshot())
@@ -0,0 +1,111 @@
+'''
+Connection pool settings shared by every worker, read from the environment:
+
+    DB_POOL_SIZE            connections kept open per worker (default 5)
+    DB_POOL_MAX_OVERFLOW    extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT         seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE         seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING        test connections before handing them out (default true)
+    DB_STATEMENT_TIMEOUT    PostgreSQL statement_timeout in ms, 0 disables it (default 0)
+'''
+import os
+import time
+from threading import Lock
+
+from flask import jsonify
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    '''
+    Counters fed by the pool: how long checkouts waited for a connection
+    (including opening a new one) and how many connections were opened.
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_connect(self):
+        with self.lock:
+            self.connects += 1
+
+    def snapshot(self, pool):
+        stats = {
+            'checkouts': self.checkouts,
+            'connects': self.connects,
+            'wait_ms_total': self.wait_total * 1000,
+            'wait_ms_avg': (self.wait_total * 1000 / self.checkouts) if self.checkouts else 0.0,
+            'wait_ms_max': self.wait_max * 1000,
+        }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            })
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool timing every checkout for pool_metrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+@event.listens_for(TimedQueuePool, 'connect')
+def count_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connect()
+
+
+def engine_options(database_uri, environ=os.environ):
+    '''
+    SQLALCHEMY_ENGINE_OPTIONS for the given database. SQLite keeps the pool
+    SQLAlchemy picks for it, only pre-ping and recycle apply there.
+    '''
+    options = {
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if make_url(database_uri).drivername.startswith('sqlite'):
+        return options
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': int(environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', 30)),
+    })
+    statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT', 0))
+    if statement_timeout:
+        options['connect_args'] = {'options': '-c statement_timeout={0}'.format(statement_timeout)}
+    return options
+
+
+def register_metrics(app, db):
+    # GET /metrics with the pool statistics of this worker
+    @app.route('/metrics')
+    def metrics():
+        return jsonify({'pool': pool_metrics.snapshot(db.get_engine().pool)})
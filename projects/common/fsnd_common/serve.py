@@ -0,0 +1,114 @@
+'''
+Production server of every project. Gunicorn forks its workers from a
+master that imported the app once (preload_app), so its modules, models and
+compiled templates are shared by every worker instead of being loaded by
+each of them:
+
+    python serve.py --workers 4 --threads 8
+
+Each project's serve.py only says how its app is loaded, a function
+returning the Flask app and its Flask-SQLAlchemy db passed to main(), and
+optionally checks the gunicorn options before anything is loaded.
+
+Defaults come from WEB_CONCURRENCY (workers), WEB_THREADS and PORT. Send
+SIGHUP to the master to replace the workers gracefully, finishing the
+requests in flight; new code needs SIGUSR2 (a new master) then SIGQUIT to
+the old one, as the app is loaded before forking.
+'''
+import argparse
+import multiprocessing
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+
+STARTED = time.perf_counter()
+
+
+def elapsed_ms(since=STARTED):
+    return (time.perf_counter() - since) * 1000
+
+
+def warm_templates(app):
+    # Compiles every template in the master, forked workers inherit them
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
+class Server(BaseApplication):
+    '''
+    Gunicorn application preloading the Flask app and reporting how long
+    the master and each worker took to get ready.
+    '''
+
+    def __init__(self, load_app, options):
+        self.load_app = load_app
+        self.options = options
+        self.application = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('when_ready', self.when_ready)
+        self.cfg.set('post_fork', self.post_fork)
+        self.cfg.set('post_worker_init', self.post_worker_init)
+
+    def load(self):
+        if self.application is None:
+            start = time.perf_counter()
+            app, db = self.load_app()
+            imported = elapsed_ms(start)
+            warm_templates(app)
+            # Connections opened while loading must not be shared with the workers
+            with app.app_context():
+                db.engine.dispose()
+            self.application = app
+            self.load_report = 'app imported in {0:.0f} ms, templates compiled in {1:.0f} ms'.format(
+                imported, elapsed_ms(start) - imported)
+        return self.application
+
+    def when_ready(self, server):
+        server.log.info('Startup: %s, master ready %.0f ms after launch (%d workers x %d threads)',
+                        self.load_report, elapsed_ms(), self.cfg.workers, self.cfg.threads)
+
+    def post_fork(self, server, worker):
+        worker.forked_at = time.perf_counter()
+
+    def post_worker_init(self, worker):
+        worker.log.info('Startup: worker %s ready %.1f ms after fork', worker.pid, elapsed_ms(worker.forked_at))
+
+
+def arguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default='0.0.0.0:{0}'.format(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help='threads per worker')
+    parser.add_argument('--timeout', type=int, default=30, help='seconds before a silent worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='seconds workers get to finish their requests on reload or shutdown')
+    return parser.parse_args(argv)
+
+
+def gunicorn_options(argv=None):
+    args = arguments(argv)
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'preload_app': True,
+    }
+
+
+def main(load_app, check=None):
+    # check(options) sets the app up for the options before it is loaded,
+    # or exits with a message when it can't run that way
+    options = gunicorn_options()
+    if check:
+        check(options)
+    Server(load_app, options).run()
@@ -0,0 +1,11 @@
+'''
+Summary statistics shared by the benchmarks and the load-testing harness.
+'''
+import math
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile: the smallest value at least pct% of values are under or equal to
+    ordered = sorted(values)
+    index = max(0, int(math.ceil(pct / 100.0 * len(ordered))) - 1)
+    return ordered[index]
@@ -0,0 +1,148 @@
+'''
+Conditional GET for the read endpoints. Every INSERT, UPDATE or DELETE on a
+table of the app also bumps the table's row in table_versions, in the same
+transaction, so the counters move exactly when writes commit, whichever
+worker issued them and however (ORM, bulk or Core statements).
+
+The tables written are only noted while the transaction runs; their rows
+are bumped right before it commits, in name order. A writer thus holds the
+lock on a counter row just for its commit, and two writers always take
+those locks in the same order, so they can't deadlock on them. Statements
+run outside a transaction bump their table on their own. A rolled back
+savepoint keeps the tables it wrote to, bumping them is harmless.
+
+Views decorated with versions.conditional(*models) compute their ETag and
+Last-Modified from those counters with a single query before running, and
+answer 304 Not Modified without rendering anything when the client already
+holds the current representation.
+'''
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import make_response, request, session
+from sqlalchemy import Column, DateTime, Integer, String, Table, bindparam, event, func, select, text
+from sqlalchemy.sql.dml import UpdateBase
+
+# Part of every tag and the oldest Last-Modified, so a new release (other
+# templates or formats) invalidates what clients hold. Workers forked from
+# a preloaded app share it
+STARTED = datetime.utcnow().replace(microsecond=0)
+
+# An upsert, PostgreSQL 9.5+ and SQLite 3.24+ both support ON CONFLICT
+BUMP = text(
+    'INSERT INTO table_versions (name, version, updated_at) VALUES (:name, 1, :now) '
+    'ON CONFLICT (name) DO UPDATE SET version = table_versions.version + 1, updated_at = :now'
+).bindparams(bindparam('now', type_=DateTime))
+
+
+def not_modified(etag, last_modified):
+    # If-Modified-Since only counts without If-None-Match (RFC 7232)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if not since or not last_modified:
+        return False
+    return last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+
+
+class TableVersions:
+    '''
+    Version counter of every table of db.metadata, bumped once per
+    transaction writing to it, and the conditional decorator reading them.
+    Only the engines of db are listened to.
+    '''
+
+    def __init__(self, db):
+        self.db = db
+        self.table = Table(
+            'table_versions', db.metadata,
+            Column('name', String(64), primary_key=True),
+            Column('version', Integer, nullable=False),
+            Column('updated_at', DateTime, nullable=False),
+        )
+        create_engine = db.create_engine
+
+        def create_listened_engine(*args, **kwargs):
+            engine = create_engine(*args, **kwargs)
+            self.listen(engine)
+            return engine
+        db.create_engine = create_listened_engine
+
+    def listen(self, engine):
+        event.listen(engine, 'after_execute', self.after_execute, named=True)
+        event.listen(engine, 'commit', self.bump)
+        event.listen(engine, 'rollback', self.forget)
+        # Connections given back without a commit or rollback of their own
+        event.listen(engine, 'checkin', self.forget_checked_in)
+
+    def after_execute(self, conn, clauseelement, **kw):
+        if not isinstance(clauseelement, UpdateBase):
+            return
+        table = clauseelement.table
+        if getattr(table, 'metadata', None) is not self.db.metadata or table is self.table:
+            return
+        if conn.in_transaction():
+            conn.info.setdefault('written_tables', set()).add(table.name)
+        else:
+            # Outside a transaction every statement commits on its own
+            conn.execute(BUMP, name=table.name, now=datetime.utcnow())
+
+    def bump(self, conn):
+        names = conn.info.pop('written_tables', None)
+        if names:
+            now = datetime.utcnow()
+            for name in sorted(names):
+                conn.execute(BUMP, name=name, now=now)
+
+    def forget(self, conn):
+        conn.info.pop('written_tables', None)
+
+    def forget_checked_in(self, dbapi_connection, connection_record):
+        connection_record.info.pop('written_tables', None)
+
+    def state(self, names, extra=()):
+        # Sum of the counters (each one only grows, so any write changes the
+        # sum), time of the last write, the extra values and the counter of
+        # each table, in one query
+        where = self.table.c.name.in_(names)
+        return self.db.session.execute(select([
+            select([func.coalesce(func.sum(self.table.c.version), 0)]).where(where).as_scalar(),
+            select([func.max(self.table.c.updated_at)]).where(where).as_scalar(),
+        ] + list(extra) + [
+            func.coalesce(select([self.table.c.version]).where(self.table.c.name == name).as_scalar(), 0)
+            for name in names
+        ])).first()
+
+    def conditional(self, *models, extra=None):
+        '''
+        Decorator for views whose response only depends on the tables of
+        models. extra, called with the view arguments, returns SQL
+        expressions the response also depends on, such as a count of shows
+        already started; their values go in the ETag, and as they aren't
+        dates those views get no Last-Modified.
+        '''
+        names = [model.__table__.name for model in models]
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pages carrying flashed messages are specific to a visitor
+                if '_flashes' in session:
+                    return view(*args, **kwargs)
+                state = tuple(self.state(names, extra(**kwargs) if extra else ())) if names else (0, None)
+                etag = hashlib.sha1(repr((STARTED, state)).encode()).hexdigest()
+                last_modified = None if extra else max(filter(None, (state[1], STARTED)))
+                if not_modified(etag, last_modified):
+                    response = make_response('', 304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                # Weak, the same representation may be sent compressed or not
+                response.set_etag(etag, weak=True)
+                if last_modified:
+                    response.last_modified = last_modified
+                return response
+            return wrapper
+        return decorator
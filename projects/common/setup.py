@@ -0,0 +1,10 @@
+from setuptools import setup
+
+setup(
+    name='fsnd-common',
+    version='0.1.0',
+    description='Server plumbing shared by the Fyyur, trivia, coffee shop and capstone apps',
+    packages=['fsnd_common'],
+    python_requires='>=3.6',
+    install_requires=['Flask', 'SQLAlchemy'],
+)
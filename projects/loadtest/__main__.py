@@ -0,0 +1,75 @@
+'''
+Load-testing harness for the four projects.
+
+Against a running server (start it with LOADTEST_AUTH=1 and
+AUTH0_JWKS_FILE=loadtest/keys/jwks.json so it accepts the locally signed
+tokens, never in production):
+
+    python -m loadtest run trivia --url http://127.0.0.1:5000 --users 20 --duration 60
+
+Against two git revisions, each checked out and served in turn:
+
+    python -m loadtest compare fyyur master my-branch --users 20 --duration 60
+
+Run from the projects directory, once pip install -r loadtest/requirements.txt
+is done. Reports throughput, latency percentiles and error rate per
+endpoint; --json saves the summaries.
+'''
+import argparse
+import os
+
+from .compare import compare
+from .scenarios import SCENARIOS
+from .runner import run
+from .stats import compare_report, report, save
+from .tokens import LocalSigner
+
+KEYS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keys')
+
+
+def arguments():
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='load a running server')
+    run_parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    run_parser.add_argument('--url', default='http://127.0.0.1:5000')
+    compare_parser = commands.add_parser('compare', help='load two git revisions in turn')
+    compare_parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    compare_parser.add_argument('revisions', nargs=2, metavar='revision')
+    compare_parser.add_argument('--port', type=int, default=5099)
+    compare_parser.add_argument('--command', help='server command run in the project directory, '
+                                'with {python} and {port} placeholders (default: flask run)')
+    compare_parser.add_argument('--warmup', type=float, default=5, help='seconds of unrecorded load first')
+    for command in (run_parser, compare_parser):
+        command.add_argument('--users', type=int, default=10)
+        command.add_argument('--duration', type=float, default=30, help='seconds')
+        command.add_argument('--think', type=float, default=0, help='mean pause between sessions in seconds')
+        command.add_argument('--seed', type=int, default=0)
+        command.add_argument('--max-id', type=int, default=100, help='highest id of the detail pages visited')
+        command.add_argument('--keys', default=KEYS, help='directory of the signing key and jwks.json')
+        command.add_argument('--json', help='file receiving the summary')
+    return parser.parse_args()
+
+
+def main():
+    options = arguments()
+    scenario = SCENARIOS[options.scenario]
+    signer = LocalSigner(options.keys)
+    if options.command == 'run':
+        summary = run(scenario, options.url, options, signer)
+        report(summary, '{0} at {1}'.format(scenario.name, options.url))
+        if options.json:
+            save(summary, options.json)
+        return
+    summaries = compare(scenario, options.revisions, options, signer)
+    for revision, summary in zip(options.revisions, summaries):
+        report(summary, '\n{0} at {1}'.format(scenario.name, revision))
+        print()
+    compare_report(summaries[0], summaries[1], options.revisions)
+    if options.json:
+        save(dict(zip(options.revisions, summaries)), options.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import http.client
+import json
+import time
+from urllib.parse import urlsplit
+
+
+class Client:
+    '''
+    Keep-alive HTTP client of one virtual user. Every request is timed and
+    recorded under its endpoint name; statuses outside expect count as errors.
+    '''
+
+    def __init__(self, base_url, stats, token=None, timeout=30):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.headers = {'Authorization': 'Bearer ' + token} if token else {}
+        self.connection = None
+
+    def request(self, method, path, name=None, body=None, expect=(200,)):
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        name = '{0} {1}'.format(method, name or path)
+        start = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            self.stats.record(name, time.perf_counter() - start, 'failed', False)
+            return None
+        self.stats.record(name, time.perf_counter() - start, response.status, response.status in expect)
+        if response.getheader('Connection', '').lower() == 'close':
+            self.close()
+        if response.status != 200 or not response.getheader('Content-Type', '').startswith('application/json'):
+            return None
+        return json.loads(data)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, body, **kwargs):
+        return self.request('POST', path, body=body, **kwargs)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,64 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from .runner import run
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@contextmanager
+def checkout(revision):
+    # Detached worktree of the revision, removed afterwards
+    path = tempfile.mkdtemp(prefix='loadtest-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', path, revision], cwd=REPOSITORY, check=True)
+    try:
+        yield path
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', path], cwd=REPOSITORY, check=True)
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited with status {0}'.format(process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server not listening on port {0} after {1}s'.format(port, timeout))
+
+
+@contextmanager
+def serve(scenario, checkout_path, port, jwks_path, command=None):
+    # Starts the scenario's app from the checkout, by default with flask run
+    env = dict(os.environ, FLASK_APP=scenario.flask_app, LOADTEST_AUTH='1', AUTH0_JWKS_FILE=jwks_path)
+    command = command or '{python} -m flask run --port {port}'
+    process = subprocess.Popen(
+        command.format(python=sys.executable, port=port).split(),
+        cwd=os.path.join(checkout_path, 'projects', scenario.directory), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process)
+        yield 'http://127.0.0.1:{0}'.format(port)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def compare(scenario, revisions, options, signer):
+    # Runs the same load against each revision in turn, returns their summaries
+    summaries = []
+    for revision in revisions:
+        with checkout(revision) as path, serve(scenario, path, options.port, signer.jwks_path, options.command) as url:
+            if options.warmup:
+                warmup = type(options)(**dict(vars(options), duration=options.warmup))
+                run(scenario, url, warmup, signer)
+            summaries.append(run(scenario, url, options, signer))
+    return summaries
@@ -0,0 +1,36 @@
+import random
+import threading
+import time
+
+from .client import Client
+from .stats import Stats
+
+
+def run(scenario, base_url, options, signer=None):
+    '''
+    Closed-loop load: options.users virtual users replay the scenario's
+    session, pausing options.think seconds between sessions, for
+    options.duration seconds. Returns the summary of the run.
+    '''
+    stats = Stats()
+    token = signer.token(scenario.audience, scenario.permissions) if signer and scenario.audience else None
+    deadline = time.monotonic() + options.duration
+
+    def user(number):
+        rng = random.Random(options.seed + number)
+        client = Client(base_url, stats, token=token)
+        try:
+            while time.monotonic() < deadline:
+                scenario.session(client, rng, options)
+                if options.think:
+                    time.sleep(rng.uniform(0, 2 * options.think))
+        finally:
+            client.close()
+
+    users = [threading.Thread(target=user, args=(number,), daemon=True) for number in range(options.users)]
+    start = time.monotonic()
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    return stats.summary(time.monotonic() - start)
@@ -0,0 +1,65 @@
+import string
+
+
+class Scenario:
+    '''
+    Load profile of one project: where it lives (relative to projects/), the
+    FLASK_APP serving it, the audience and permissions of the tokens its
+    users carry, and session(client, rng, options), one visit of a user.
+    '''
+
+    def __init__(self, name, directory, flask_app, session, audience=None, permissions=()):
+        self.name = name
+        self.directory = directory
+        self.flask_app = flask_app
+        self.session = session
+        self.audience = audience
+        self.permissions = permissions
+
+
+def browse_fyyur(client, rng, options):
+    # Home page, listings, a few detail pages and a search
+    client.get('/')
+    client.get('/venues')
+    client.get('/venues/{0}'.format(rng.randint(1, options.max_id)), name='/venues/<id>', expect=(200, 404))
+    client.get('/artists')
+    client.get('/artists/{0}'.format(rng.randint(1, options.max_id)), name='/artists/<id>', expect=(200, 404))
+    client.get('/shows')
+    client.get('/search?search_term={0}'.format(rng.choice(string.ascii_lowercase)), name='/search?search_term=<term>')
+
+
+def play_trivia(client, rng, options):
+    # Browse the questions then play a quiz of up to five questions
+    categories = client.get('/categories') or {'categories': {}}
+    client.get('/questions?page={0}'.format(rng.randint(1, 3)), name='/questions?page=<n>', expect=(200, 404))
+    category = rng.choice([0] + [int(id) for id in categories['categories']])
+    previous = []
+    for _ in range(5):
+        quiz = client.post('/quizzes', {
+            'previous_questions': previous,
+            'quiz_category': {'id': category, 'type': categories['categories'].get(str(category), 'click')},
+        })
+        if not quiz or not quiz['question']:
+            break
+        previous.append(quiz['question']['id'])
+
+
+def poll_menu(client, rng, options):
+    # The customers' menu and the baristas' detailed one
+    client.get('/drinks')
+    client.get('/drinks-detail')
+
+
+def browse_casting(client, rng, options):
+    client.get('/actors')
+    client.get('/movies')
+
+
+SCENARIOS = {
+    'fyyur': Scenario('fyyur', '01_fyyur/starter_code', 'app', browse_fyyur),
+    'trivia': Scenario('trivia', '02_trivia_api/starter/backend', 'flaskr', play_trivia),
+    'coffee': Scenario('coffee', '03_coffee_shop_full_stack/starter_code/backend', 'src.api', poll_menu,
+                       audience='coffe', permissions=['get:drinks-detail']),
+    'capstone': Scenario('capstone', 'capstone/starter', 'app', browse_casting,
+                         audience='casting-agency', permissions=['get:actors', 'get:movies']),
+}
@@ -0,0 +1,81 @@
+import json
+from collections import Counter, defaultdict
+from threading import Lock
+
+from fsnd_common.stats import percentile
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Stats:
+    '''
+    Latencies and outcomes of every request, grouped by endpoint name
+    ('GET /venues/<id>'), shared by all the virtual users of a run.
+    '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+
+    def record(self, name, seconds, status, ok):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][status] += 1
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for name, latencies in sorted(self.latencies.items()):
+            endpoints[name] = dict(
+                requests=len(latencies),
+                errors=self.errors[name],
+                error_rate=self.errors[name] / len(latencies),
+                rps=len(latencies) / elapsed,
+                statuses={str(status): count for status, count in self.statuses[name].items()},
+                max_ms=max(latencies) * 1000,
+                **{'p{0}_ms'.format(pct): percentile(latencies, pct) * 1000 for pct in PERCENTILES}
+            )
+        requests = sum(endpoint['requests'] for endpoint in endpoints.values())
+        errors = sum(endpoint['errors'] for endpoint in endpoints.values())
+        return {
+            'seconds': elapsed,
+            'requests': requests,
+            'rps': requests / elapsed,
+            'error_rate': errors / requests if requests else 0.0,
+            'endpoints': endpoints,
+        }
+
+
+def report(summary, title=''):
+    if title:
+        print(title)
+    print('{0:<36} {1:>8} {2:>8} {3:>7} {4:>8} {5:>8} {6:>8} {7:>8}'.format(
+        'endpoint', 'requests', 'req/s', 'errors', 'p50 ms', 'p90 ms', 'p95 ms', 'p99 ms'))
+    for name, endpoint in summary['endpoints'].items():
+        print('{0:<36} {1:>8} {2:>8.1f} {3:>6.1%} {4:>8.1f} {5:>8.1f} {6:>8.1f} {7:>8.1f}'.format(
+            name, endpoint['requests'], endpoint['rps'], endpoint['error_rate'],
+            endpoint['p50_ms'], endpoint['p90_ms'], endpoint['p95_ms'], endpoint['p99_ms']))
+    print('{0} requests in {1:.1f}s, {2:.1f} req/s, {3:.1%} errors'.format(
+        summary['requests'], summary['seconds'], summary['rps'], summary['error_rate']))
+
+
+def compare_report(before, after, labels):
+    # Throughput and p95 of every endpoint in two runs, with the relative change
+    print('{0:<36} {1:>12} {2:>12} {3:>8} {4:>12} {5:>12} {6:>8}'.format(
+        'endpoint', labels[0] + ' req/s', labels[1] + ' req/s', 'change', labels[0] + ' p95', labels[1] + ' p95', 'change'))
+    for name in sorted(set(before['endpoints']) | set(after['endpoints'])):
+        a, b = before['endpoints'].get(name), after['endpoints'].get(name)
+        if a is None or b is None:
+            print('{0:<36} only in {1}'.format(name, labels[0] if b is None else labels[1]))
+            continue
+        print('{0:<36} {1:>12.1f} {2:>12.1f} {3:>+8.1%} {4:>12.1f} {5:>12.1f} {6:>+8.1%}'.format(
+            name, a['rps'], b['rps'], b['rps'] / a['rps'] - 1,
+            a['p95_ms'], b['p95_ms'], b['p95_ms'] / a['p95_ms'] - 1))
+
+
+def save(summary, path):
+    with open(path, 'w') as output:
+        json.dump(summary, output, indent=2)
@@ -0,0 +1,45 @@
+import json
+import os
+import time
+
+import rsa
+from jose import jwk, jwt
+
+# Issuer the APIs check, see auth/auth.py in the coffee shop and capstone
+AUTH0_DOMAIN = 'fsdnd-alan.us.auth0.com'
+KEY_ID = 'loadtest'
+
+
+class LocalSigner:
+    '''
+    RSA key pair standing in for Auth0. The APIs accept its tokens once
+    started with LOADTEST_AUTH=1 and AUTH0_JWKS_FILE pointing to jwks.json in
+    the key directory. The private key is readable by its owner only.
+    '''
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.jwks_path = os.path.join(self.directory, 'jwks.json')
+        key_path = os.path.join(self.directory, 'private.pem')
+        if not os.path.exists(key_path):
+            os.makedirs(self.directory, exist_ok=True)
+            public, private = rsa.newkeys(2048)
+            with os.fdopen(os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as key:
+                key.write(private.save_pkcs1())
+            public_key = jwk.construct(public.save_pkcs1().decode(), 'RS256').to_dict()
+            public_key.update({'kid': KEY_ID, 'use': 'sig'})
+            with open(self.jwks_path, 'w') as jwks:
+                json.dump({'keys': [public_key]}, jwks)
+        with open(key_path) as key:
+            self.private_key = key.read()
+
+    def token(self, audience, permissions, ttl=24 * 3600):
+        now = int(time.time())
+        return jwt.encode({
+            'iss': 'https://{0}/'.format(AUTH0_DOMAIN),
+            'sub': 'loadtest|1',
+            'aud': audience,
+            'iat': now,
+            'exp': now + ttl,
+            'permissions': list(permissions),
+        }, self.private_key, algorithm='RS256', headers={'kid': KEY_ID})